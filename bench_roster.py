@@ -0,0 +1,335 @@
+from ortools.sat.python import cp_model
+import argparse
+from datetime import datetime
+import json
+import multiprocessing
+import re
+import resource
+import subprocess
+import time
+import ortools
+from roster_model import FOUR_SHIFTS, TWO_SHIFTS, RosterModelBuilder, canonical_roster, roster_from_solution
+import shift_scheduling_sat
+import workforce_mip
+
+SWEEP_MODELS = {
+    'two': 'main_1xS.py model, 2 shifts per day',
+    'four': 'main.py model, 4 shifts per day',
+    'sat': 'shift_scheduling_sat.py model, 3 work shifts per day',
+}
+
+
+def model_size(model):
+    proto = model.Proto()
+    return len(proto.variables), len(proto.constraints), proto.ByteSize()
+
+
+def time_to_first_solution(model, time_limit):
+    solver = cp_model.CpSolver()
+    solver.parameters.linearization_level = 0
+    solver.parameters.stop_after_first_solution = True
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    return solver.StatusName(status), solver.WallTime()
+
+
+TRANSITION_ENCODINGS = [
+    ('pairwise', {'compact_transitions': False}),
+    ('window', {}),
+    ('automaton', {'automaton_transitions': True}),
+]
+
+
+def bench_transitions(num_nurses, weeks_list, time_limit):
+    """Compares the pairwise, sliding-window and automaton rest rule
+    encodings."""
+    print('%-8s %-9s %8s %8s %10s %8s %10s %8s' % ('weeks', 'encoding', 'vars', 'constrs', 'bytes', 'build s',
+                                                   'status', 'first s'))
+    for num_weeks in weeks_list:
+        for encoding, options in TRANSITION_ENCODINGS:
+            t0 = time.perf_counter()
+            builder = RosterModelBuilder(FOUR_SHIFTS, num_nurses, num_weeks, **options)
+            model, _ = builder.build()
+            build_time = time.perf_counter() - t0
+            num_vars, num_constraints, num_bytes = model_size(model)
+            status, wall_time = time_to_first_solution(model, time_limit)
+            print('%-8i %-9s %8i %8i %10i %8.2f %10s %8.2f' % (num_weeks, encoding, num_vars, num_constraints,
+                                                               num_bytes, build_time, status, wall_time))
+
+
+class CanonicalSolutionCounter(cp_model.CpSolverSolutionCallback):
+    """Counts the solutions and the distinct ones modulo operator relabeling."""
+
+    def __init__(self, index, groups, limit):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self._index = index
+        self._groups = groups
+        self._limit = limit
+        self.solution_count = 0
+        self.canonical = set()
+
+    def on_solution_callback(self):
+        roster = roster_from_solution(self.Response().solution, self._index)
+        self.canonical.add(canonical_roster(roster, self._groups).tobytes())
+        self.solution_count += 1
+        if self.solution_count >= self._limit:
+            self.StopSearch()
+
+
+def bench_symmetry(num_nurses, weeks_list, time_limit, solution_limit):
+    """Compares the model with and without symmetry breaking: time to first
+    solution, and solutions enumerated in the time limit against the
+    non-equivalent ones among them."""
+    print('%-8s %-9s %10s %8s %10s %10s' % ('weeks', 'symmetry', 'status', 'first s', 'solutions', 'distinct'))
+    for num_weeks in weeks_list:
+        for break_symmetry in (False, True):
+            builder = RosterModelBuilder(FOUR_SHIFTS, num_nurses, num_weeks, break_symmetry=break_symmetry)
+            model, shifts = builder.build()
+            status, wall_time = time_to_first_solution(model, time_limit)
+            counter = CanonicalSolutionCounter(
+                shifts.index(),
+                builder.symmetry_groups(), solution_limit)
+            solver = cp_model.CpSolver()
+            solver.parameters.linearization_level = 0
+            solver.parameters.max_time_in_seconds = time_limit
+            solver.SearchForAllSolutions(model, counter)
+            print('%-8i %-9s %10s %8.2f %10i %10i' % (num_weeks, 'broken' if break_symmetry else 'none', status,
+                                                       wall_time, counter.solution_count, len(counter.canonical)))
+
+
+def bench_workforce(engines, weeks_list, num_nurses, time_limit):
+    """Solves the workforce_mip.py model with each engine: build and solve
+    time and the value of each objective."""
+    print('%-7s %5s %8s %8s %8s %8s %10s  %s' % ('engine', 'weeks', 'build s', 'vars', 'constrs', 'solve s',
+                                                 'status', 'objectives'))
+    for num_weeks in weeks_list:
+        for engine in engines:
+            t0 = time.perf_counter()
+            model = workforce_mip.WorkforceModel(engine, num_weeks, num_nurses)
+            build_time = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            status, values = model.solve(time_limit)
+            print('%-7s %5i %8.2f %8i %8i %8.2f %10s  %s' % (
+                engine, num_weeks, build_time, model.solver.NumVariables(), model.solver.NumConstraints(),
+                time.perf_counter() - t0, workforce_mip.status_name(status),
+                ' '.join('%s=%g' % value for value in values)))
+
+
+class WorkRecorder(cp_model.CpSolverSolutionCallback):
+    """Keeps the values of the work variables of every solution."""
+
+    def __init__(self, work):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self._work = work
+        self.assignments = []
+
+    def on_solution_callback(self):
+        self.assignments.append({key: self.Value(var) for key, var in self._work.items()})
+
+
+def pinned_objective(num_employees, num_weeks, encoding, assignment):
+    """Smallest objective of the shift_scheduling_sat.py model with the work
+    variables pinned to an assignment."""
+    model, work = shift_scheduling_sat.create_shift_scheduling_model(num_employees, num_weeks, encoding)[:2]
+    for key, value in assignment.items():
+        model.Add(work[key] == value)
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    status = solver.Solve(model)
+    return solver.ObjectiveValue() if status == cp_model.OPTIMAL else None
+
+
+def bench_sequence(sizes, time_limit, num_workers):
+    """Compares the span and the run length encodings of the sequence
+    constraints of shift_scheduling_sat.py.
+
+    The penalties must match: every solution found with the span encoding is
+    pinned in both models and must get the same objective, and so must the
+    optimum of the 8 employee instance when both solves prove it.
+    """
+    encodings = sorted(shift_scheduling_sat.SEQUENCE_ENCODINGS)
+    recorder = None
+    print('%-9s %5s %5s %8s %8s %8s %10s %8s %8s %10s' % ('encoding', 'empl', 'weeks', 'build s', 'vars',
+                                                         'constrs', 'bytes', 'first s', 'wall s', 'objective'))
+    for num_employees, num_weeks in sizes:
+        objectives = {}
+        for encoding in encodings:
+            t0 = time.perf_counter()
+            model, work = shift_scheduling_sat.create_shift_scheduling_model(num_employees, num_weeks, encoding)[:2]
+            build_time = time.perf_counter() - t0
+            num_vars, num_constraints, num_bytes = model_size(model)
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = time_limit
+            solver.parameters.num_search_workers = num_workers
+            timer = FirstSolutionTimer()
+            status = solver.Solve(model, timer)
+            found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+            if status == cp_model.OPTIMAL:
+                objectives[encoding] = solver.ObjectiveValue()
+            print('%-9s %5i %5i %8.2f %8i %8i %10i %8s %8.2f %10s' % (
+                encoding, num_employees, num_weeks, build_time, num_vars, num_constraints, num_bytes,
+                _seconds(timer.first_solution_time), solver.WallTime(),
+                '%i%s' % (solver.ObjectiveValue(), '' if status == cp_model.OPTIMAL else '?') if found else '-'))
+            if recorder is None and encoding == 'spans':
+                # a few assignments of the first size to check the penalties
+                recorder = WorkRecorder(work)
+                solver = cp_model.CpSolver()
+                solver.parameters.max_time_in_seconds = min(time_limit, 10.0)
+                solver.parameters.num_search_workers = 1
+                solver.Solve(model, recorder)
+                check = (num_employees, num_weeks)
+        if len(objectives) == len(encodings) and len(set(objectives.values())) > 1:
+            raise AssertionError('Different optima with %i employees and %i weeks: %s' % (
+                num_employees, num_weeks, objectives))
+    mismatches = 0
+    for assignment in recorder.assignments:
+        pinned = [pinned_objective(check[0], check[1], encoding, assignment) for encoding in encodings]
+        if len(set(pinned)) > 1:
+            mismatches += 1
+            print('Mismatch: %s' % dict(zip(encodings, pinned)))
+    print('%i solutions with %i employees and %i weeks checked, %i mismatches' % (
+        len(recorder.assignments), check[0], check[1], mismatches))
+    if mismatches:
+        raise AssertionError('The sequence encodings do not give the same penalties')
+
+
+class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """Records the wall time of the first solution."""
+
+    def __init__(self):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.first_solution_time = None
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        if self.first_solution_time is None:
+            self.first_solution_time = self.WallTime()
+        self.solution_count += 1
+
+
+def run_case(case):
+    """Builds and solves one sweep case; meant to run in its own process so
+    that the peak RSS only accounts for this case."""
+    model_name, num_nurses, num_weeks, time_limit, num_workers = case
+    t0 = time.perf_counter()
+    if model_name == 'sat':
+        model = shift_scheduling_sat.create_shift_scheduling_model(num_nurses, num_weeks)[0]
+    else:
+        pattern = TWO_SHIFTS if model_name == 'two' else FOUR_SHIFTS
+        model, _ = RosterModelBuilder(pattern, num_nurses, num_weeks).build()
+    build_time = time.perf_counter() - t0
+    num_vars, num_constraints, num_bytes = model_size(model)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.linearization_level = 0
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = num_workers
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    log = []
+    solver.log_callback = log.append
+    timer = FirstSolutionTimer()
+    status = solver.Solve(model, timer)
+
+    presolve_start = presolve_end = None
+    for line in log:
+        match = re.match(r'Starting presolve at ([\d.]+)s', line)
+        if match:
+            presolve_start = float(match.group(1))
+        # one worker loads the model after the presolve, several start the
+        # search at once
+        match = re.match(r'Starting (?:to load the model|search) at ([\d.]+)s', line)
+        if match and presolve_end is None:
+            presolve_end = float(match.group(1))
+    presolve_time = None
+    if presolve_start is not None and presolve_end is not None:
+        presolve_time = presolve_end - presolve_start
+    return {'model': model_name, 'nurses': num_nurses, 'weeks': num_weeks, 'time_limit': time_limit,
+            'workers': num_workers, 'build_time': build_time, 'variables': num_vars,
+            'constraints': num_constraints, 'proto_bytes': num_bytes, 'presolve_time': presolve_time,
+            'first_solution_time': timer.first_solution_time, 'wall_time': solver.WallTime(),
+            'status': solver.StatusName(status), 'objective': solver.ObjectiveValue() if timer.solution_count else None,
+            'conflicts': solver.NumConflicts(), 'branches': solver.NumBranches(),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_sweep(models, nurses_list, weeks_list, time_limit, num_workers, output):
+    """Runs every (model, nurses, weeks) case in a fresh process and appends
+    one JSON line per case to output."""
+    run = {'commit': git_commit(), 'ortools': ortools.__version__, 'date': datetime.now().isoformat()}
+    print('%-5s %6s %5s %8s %8s %8s %8s %8s %8s %10s %8s' % ('model', 'nurses', 'weeks', 'build s', 'vars',
+                                                            'constrs', 'presol s', 'first s', 'wall s', 'status',
+                                                            'rss MB'))
+    with open(output, 'a') as results:
+        for model_name in models:
+            for num_nurses in nurses_list:
+                for num_weeks in weeks_list:
+                    with multiprocessing.Pool(1) as pool:
+                        result = pool.apply(run_case, ((model_name, num_nurses, num_weeks, time_limit, num_workers),))
+                    result.update(run)
+                    results.write(json.dumps(result) + '\n')
+                    results.flush()
+                    print('%-5s %6i %5i %8.2f %8i %8i %8s %8s %8.2f %10s %8.1f' % (
+                        model_name, num_nurses, num_weeks, result['build_time'], result['variables'],
+                        result['constraints'], _seconds(result['presolve_time']),
+                        _seconds(result['first_solution_time']), result['wall_time'], result['status'],
+                        result['peak_rss_mb']))
+
+
+def _seconds(value):
+    return '-' if value is None else '%.2f' % value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Roster model benchmarks.')
+    subparsers = parser.add_subparsers(dest='bench', required=True)
+    transitions = subparsers.add_parser('transitions', help='pairwise, sliding-window and automaton rest rules')
+    symmetry = subparsers.add_parser('symmetry', help='with and without symmetry breaking')
+    symmetry.add_argument('--solution_limit', type=int, default=1000)
+    sequence = subparsers.add_parser('sequence', help='span against run length sequence constraints of '
+                                                      'shift_scheduling_sat.py, and a check of their penalties')
+    sequence.add_argument('--sizes', nargs='+', default=['8x3', '50x12'],
+                          help='EMPLOYEESxWEEKS instances, the first one is used to check the penalties')
+    sequence.add_argument('--time_limit', type=float, default=60.0)
+    sequence.add_argument('--workers', type=int, default=1)
+    workforce = subparsers.add_parser('workforce', help='MIP against CP-SAT engines on the workforce_mip.py model')
+    workforce.add_argument('--engines', nargs='+', choices=workforce_mip.ENGINES, default=workforce_mip.ENGINES)
+    workforce.add_argument('--nurses', type=int, default=22)
+    workforce.add_argument('--weeks', type=int, nargs='+', default=[6, 10, 26])
+    workforce.add_argument('--time_limit', type=float, default=60.0, help='time budget of each objective')
+    sweep = subparsers.add_parser('sweep', help='model size and solve statistics across horizons and staff sizes')
+    sweep.add_argument('--models', nargs='+', choices=sorted(SWEEP_MODELS), default=['two', 'four', 'sat'],
+                       help=', '.join('%s: %s' % item for item in sorted(SWEEP_MODELS.items())))
+    sweep.add_argument('--nurses', type=int, nargs='+', default=[10, 22, 40, 60])
+    sweep.add_argument('--weeks', type=int, nargs='+', default=[4, 8, 13, 26, 52])
+    sweep.add_argument('--time_limit', type=float, default=60.0)
+    sweep.add_argument('--workers', type=int, default=1)
+    sweep.add_argument('--output', default='bench_results.jsonl', help='JSON lines file the results are appended to')
+    for sub in (transitions, symmetry):
+        sub.add_argument('--nurses', type=int, default=22)
+        sub.add_argument('--weeks', type=int, nargs='+', default=[10, 26, 52])
+        sub.add_argument('--time_limit', type=float, default=60.0)
+    args = parser.parse_args(argv)
+    if args.bench == 'transitions':
+        bench_transitions(args.nurses, args.weeks, args.time_limit)
+    elif args.bench == 'symmetry':
+        bench_symmetry(args.nurses, args.weeks, args.time_limit, args.solution_limit)
+    elif args.bench == 'workforce':
+        bench_workforce(args.engines, args.weeks, args.nurses, args.time_limit)
+    elif args.bench == 'sequence':
+        bench_sequence([tuple(int(n) for n in size.split('x')) for size in args.sizes], args.time_limit,
+                       args.workers)
+    else:
+        bench_sweep(args.models, args.nurses, args.weeks, args.time_limit, args.workers, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+from ortools.sat.python import cp_model
+import argparse
+import math
+import numpy as np
+from roster_model import FOUR_SHIFTS, TWO_SHIFTS, RosterModelBuilder, code_version, read_config, read_demand, \
+    roster_from_solution
+from roster_output import SolutionWriter
+from roster_verify import print_violations
+import solver_settings
+
+
+class BlockModelBuilder(RosterModelBuilder):
+    """Roster model of one block of a rolling horizon.
+
+    The model covers weeks [first_week, first_week + num_weeks) of the
+    horizon. Its first history_weeks repeat the end of the committed roster
+    and are pinned to it, so the rest windows see the boundary state; the
+    following commit_weeks are the ones kept from this block. The fairness
+    bounds are the ones of the whole horizon, prorated to the end of the
+    block with some slack, and shifted by the shifts the committed roster
+    already gives before the block. Both the whole block and its committed
+    part never fall below what the weeks after them can still make up for.
+    """
+
+    def __init__(self, horizon, first_week, num_weeks, committed, history_weeks, commit_weeks, slack):
+        RosterModelBuilder.__init__(self, horizon.pattern, horizon.num_nurses, num_weeks, restricted=horizon.restricted,
+                                    break_symmetry=False,
+                                    demand=horizon.demand[first_week * 7:(first_week + num_weeks) * 7])
+        self.horizon = horizon
+        self.first_week = first_week
+        self.first_day = first_week * 7
+        self.committed = committed
+        self.history_days = history_weeks * 7
+        self.commit_days = commit_weeks * 7
+        self.slack = slack
+        self.fraction = (first_week + num_weeks) / horizon.num_weeks
+        self.weeks_after = horizon.num_weeks - first_week - num_weeks
+        self.last = first_week + num_weeks == horizon.num_weeks
+        self.max_shifts_per_nurse_per_week = horizon.max_shifts_per_nurse_per_week
+
+    def build(self):
+        model, shifts = RosterModelBuilder.build(self)
+        # pin the history
+        for d in range(self.history_days):
+            for s in self.shift_list:
+                n = self.committed[self.first_day + d, s]
+                if n >= 0:
+                    model.Add(shifts[(n, d, s)] == 1)
+        # the committed part must leave a reachable state to the next blocks
+        if not self.last:
+            kept_days = self.days[:self.history_days + self.commit_days]
+            weeks_after = self.weeks_after + self.num_weeks - len(kept_days) // 7
+            for n in self.nurses:
+                for kind in ('total', 'sunday'):
+                    lower = self.horizon.count_bounds(n, kind)[0]
+                    if lower is None or (kind == 'total' and n in self.restricted):
+                        continue
+                    before = count_shifts(self.horizon, self.committed[:self.first_day], n, kind)
+                    model.Add(self.count_expression(shifts, n, kind, kept_days)
+                              >= lower - self.capacity(kind, weeks_after) - before)
+        return model, shifts
+
+    def count_bounds(self, n, kind):
+        lower, upper = self.horizon.count_bounds(n, kind)
+        if not self.last:
+            if lower is not None:
+                lower = max(0, math.floor(lower * self.fraction) - self.slack,
+                            lower - self.capacity(kind, self.weeks_after))
+            if upper is not None:
+                upper = min(upper, math.ceil(upper * self.fraction) + self.slack)
+        before = count_shifts(self.horizon, self.committed[:self.first_day], n, kind)
+        return (None if lower is None else lower - before,
+                None if upper is None else upper - before)
+
+    def capacity(self, kind, weeks):
+        """Most shifts of a kind an operator can work in weeks weeks."""
+        if kind == 'sunday':
+            # one sunday in every window of 4
+            return -(-weeks // 4)
+        return weeks * self.max_shifts_per_nurse_per_week
+
+
+def count_shifts(builder, roster, n, kind):
+    """Counts the shifts of a kind worked by n in a (day, shift) roster that
+    starts on a monday."""
+    pattern = builder.pattern
+    worked = np.asarray(roster) == n
+    if kind == 'total':
+        return int(worked.sum())
+    if kind == 'sunday':
+        return int(worked[6::7].sum())
+    if kind == 'prima':
+        return int(worked[:, pattern.prima_shifts].sum())
+    if kind == 'seconda':
+        return int(worked[:, pattern.seconda_shifts].sum())
+    raise ValueError('Unknown count kind %s' % kind)
+
+
+def solve_rolling(pattern, num_nurses, num_weeks, settings, block_weeks=4, overlap_weeks=2, history_weeks=3,
+                  max_slack=3, demand=None):
+    """Solves the roster block by block.
+
+    Each model spans history_weeks already committed, block_weeks to commit
+    and overlap_weeks of look-ahead that are solved again with the next
+    block. The last model commits everything up to the end of the horizon
+    and enforces the exact fairness bounds of the whole horizon. A block
+    without a solution is retried with more slack on the prorated bounds.
+
+    Returns the (day, shift) roster of the horizon and one statistics dict
+    per block.
+    """
+    horizon = RosterModelBuilder(pattern, num_nurses, num_weeks, demand=demand)
+    committed = np.full((horizon.num_days, pattern.num_shifts), -1, dtype=np.int16)
+    stats = []
+    first_week = 0
+    while first_week < num_weeks:
+        model_first_week = max(0, first_week - history_weeks)
+        model_end_week = min(num_weeks, first_week + block_weeks + overlap_weeks)
+        commit_end_week = num_weeks if model_end_week == num_weeks else first_week + block_weeks
+        for slack in range(1, max_slack + 1):
+            block = BlockModelBuilder(horizon, model_first_week, model_end_week - model_first_week, committed,
+                                      first_week - model_first_week, commit_end_week - first_week, slack)
+            model, shifts = block.build()
+            solver = cp_model.CpSolver()
+            settings.apply(solver)
+            status = solver.Solve(model)
+            stats.append({'first_week': first_week, 'weeks': model_end_week - model_first_week, 'slack': slack,
+                          'status': solver.StatusName(status), 'wall_time': solver.WallTime(),
+                          'variables': len(model.Proto().variables),
+                          'constraints': len(model.Proto().constraints)})
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break
+        else:
+            raise RuntimeError('No roster for the block starting at week %i' % first_week)
+        index = shifts.index()
+        roster = roster_from_solution(solver.ResponseProto().solution, index)
+        offset = first_week * 7 - block.first_day
+        committed[first_week * 7:commit_end_week * 7] = roster[offset:offset + (commit_end_week - first_week) * 7]
+        first_week = commit_end_week
+    return committed, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generates a long roster block by block.')
+    parser.add_argument('--shifts', type=int, choices=[2, 4], default=4, help='shifts per day')
+    parser.add_argument('--weeks', type=int, help='weeks of the horizon (default: from TurniConfig.xlsx)')
+    parser.add_argument('--block_weeks', type=int, default=4)
+    parser.add_argument('--overlap_weeks', type=int, default=2)
+    solver_settings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    print('Code version: ' + code_version)
+    num_nurses, start_date, num_weeks, operators_name_list, config_rows = read_config()
+    num_weeks = args.weeks or num_weeks
+    settings = solver_settings.settings_from_args(args, config_rows)
+    pattern = FOUR_SHIFTS if args.shifts == 4 else TWO_SHIFTS
+    demand = read_demand(pattern, start_date, num_weeks)
+    roster, stats = solve_rolling(pattern, num_nurses, num_weeks, settings, args.block_weeks, args.overlap_weeks,
+                                  demand=demand)
+    writer = SolutionWriter(start_date, num_weeks * 7, pattern.shift_names, operators_name_list)
+    writer.write(pattern.solution_prefix + '0.csv', roster)
+    writer.close()
+    print()
+    print('Statistics')
+    for block in stats:
+        print('  - week %3i (%i weeks, slack %i): %-10s %8.2f s, %i variables, %i constraints' % (
+            block['first_week'], block['weeks'], block['slack'], block['status'], block['wall_time'],
+            block['variables'], block['constraints']))
+    print('  - wall time       : %f s' % sum(block['wall_time'] for block in stats))
+    print_violations(roster, RosterModelBuilder(pattern, num_nurses, num_weeks, demand=demand), start_date,
+                     operators_name_list)
+
+
+if __name__ == '__main__':
+    main()
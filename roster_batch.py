@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Solves a table of roster scenarios across a process pool.
+
+A scenario changes some of the TurniConfig.xlsx parameters: the start date,
+the number of weeks, the operators, the shift pattern, the fairness mode
+and the time budget. Every scenario writes its roster to its own directory
+and the summary table of all of them to summary.csv, so nothing overwrites
+the Solution_*.csv files of the working directory.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import time
+import roster_config
+
+# Columns of the scenario table; only name is required, the others default
+# to the configuration workbook.
+COLUMNS = ['name', 'start_date', 'weeks', 'operators', 'exclude', 'shifts', 'fairness', 'time_limit']
+# Rows of a sheet per scenario, PARAMETRO/VALORE like the Parametri sheet.
+SHEET_PARAMETERS = {roster_config.START_DATE: 'start_date', roster_config.NUM_WEEKS: 'weeks',
+                    roster_config.OPERATORS: 'operators'}
+SUMMARY_COLUMNS = ['scenario', 'status', 'wall_time', 'objective', 'total_spread', 'sunday_spread',
+                   'prima_spread', 'seconda_spread', 'violations', 'directory']
+
+
+def read_scenarios(filename):
+    """Reads the scenarios of a .csv table or of a workbook.
+
+    A workbook has either a sheet with the table, one row per scenario, or
+    one PARAMETRO/VALORE sheet per scenario, named after it. Returns a list
+    of {column: value} dicts without the empty cells.
+    """
+    if filename.endswith('.csv'):
+        with open(filename, newline='') as table:
+            rows = list(csv.DictReader(table))
+    else:
+        import pandas as pd
+        workbook = pd.ExcelFile(filename)
+        rows = []
+        for sheet in workbook.sheet_names:
+            frame = workbook.parse(sheet)
+            if 'name' in frame.columns:
+                rows.extend(frame.to_dict('records'))
+            elif 'PARAMETRO' in frame.columns and 'VALORE' in frame.columns:
+                row = {'name': sheet}
+                for parameter, value in zip(frame['PARAMETRO'], frame['VALORE']):
+                    parameter = str(parameter).strip()
+                    row[SHEET_PARAMETERS.get(parameter, parameter.lower())] = value
+                rows.append(row)
+    scenarios = []
+    for row in rows:
+        scenario = {}
+        for column, value in row.items():
+            if hasattr(value, 'strftime'):
+                value = value.strftime('%d/%m/%Y')
+            if value is None or value != value or str(value).strip() == '':
+                continue
+            if column not in COLUMNS:
+                raise roster_config.ConfigError('Unknown scenario column %s, use %s' % (column, ', '.join(COLUMNS)))
+            scenario[column] = str(value).strip()
+        if scenario:
+            if 'name' not in scenario:
+                raise roster_config.ConfigError('A scenario of %s has no name' % filename)
+            scenarios.append(scenario)
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) < len(names):
+        raise roster_config.ConfigError('The scenario names of %s are not unique' % filename)
+    return scenarios
+
+
+def directory_name(name):
+    """Returns a directory name for a scenario name."""
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'scenario'
+
+
+def run_scenario(task):
+    """Builds and solves one scenario in a pool process, writes its roster
+    and returns its summary row."""
+    scenario, defaults, output_dir, num_workers = task
+    start = time.perf_counter()
+    summary = {'scenario': scenario['name'], 'directory': os.path.join(output_dir, directory_name(scenario['name']))}
+    try:
+        solve_scenario(scenario, defaults, num_workers, summary)
+    except Exception as e:
+        # a failed scenario is a row of the summary, not the end of the
+        # batch; a ConfigError, or a ValueError, before the solve is a
+        # scenario that cannot be built
+        if isinstance(e, ValueError) and 'status' not in summary:
+            summary['status'] = 'INVALID: %s' % e
+        else:
+            summary['status'] = 'ERROR: %s: %s' % (type(e).__name__, e)
+    summary['wall_time'] = time.perf_counter() - start
+    return summary
+
+
+def solve_scenario(scenario, defaults, num_workers, summary):
+    """Builds and solves a scenario and writes its roster to
+    summary['directory']; fills in the other columns of summary."""
+    from ortools.sat.python import cp_model
+    import numpy as np
+    from roster_model import (FOUR_SHIFTS, TWO_SHIFTS, RosterModelBuilder, read_demand, roster_from_solution,
+                              solve_lexicographic)
+    from roster_output import SolutionWriter
+    from roster_verify import verify_roster
+
+    start_date = scenario.get('start_date', defaults['start_date'])
+    num_weeks = int(float(scenario.get('weeks', defaults['weeks'])))
+    names = [name.strip() for name in scenario.get('operators', ','.join(defaults['operators'])).split(',')]
+    excluded = set(name.strip() for name in scenario.get('exclude', '').split(',') if name.strip())
+    names = [name for name in names if name and name not in excluded]
+    # the restricted operator keeps its restrictions wherever it is in the
+    # list of the scenario, and nobody gets them without it
+    restricted = tuple(n for n, name in enumerate(names) if name == defaults['restricted'])
+    pattern = TWO_SHIFTS if scenario.get('shifts', '4').strip() in ('2', '2.0') else FOUR_SHIFTS
+    soft = scenario.get('fairness', 'hard') == 'soft'
+    demand = read_demand(pattern, start_date, num_weeks)
+    builder = RosterModelBuilder(pattern, len(names), num_weeks, restricted=restricted, demand=demand,
+                                 soft_fairness=soft)
+    model, shifts = builder.build()
+
+    solver = cp_model.CpSolver()
+    solver.parameters.linearization_level = 0
+    solver.parameters.num_search_workers = num_workers
+    solver.parameters.max_time_in_seconds = float(scenario.get('time_limit', defaults['time_limit']))
+    if soft:
+        status, response = solve_lexicographic(model, [builder.fairness_objective()], solver)
+    else:
+        status = solver.Solve(model)
+        response = solver.ResponseProto()
+    summary['status'] = solver.StatusName(status)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        roster = roster_from_solution(response.solution, shifts.index())
+        if soft:
+            summary['objective'] = response.objective_value
+        worked = roster[np.newaxis] == np.arange(builder.num_nurses)[:, np.newaxis, np.newaxis]
+        counts = {'total': worked.sum(axis=(1, 2)), 'sunday': worked[:, builder.sundays].sum(axis=(1, 2))}
+        if pattern.prima_shifts:
+            counts['prima'] = worked[:, :, pattern.prima_shifts].sum(axis=(1, 2))
+            counts['seconda'] = worked[:, :, pattern.seconda_shifts].sum(axis=(1, 2))
+        for kind, count in counts.items():
+            regular = count[builder.regular_nurses]
+            if len(regular):
+                summary[kind + '_spread'] = int(regular.max() - regular.min())
+        summary['violations'] = len(verify_roster(roster, builder))
+        os.makedirs(summary['directory'], exist_ok=True)
+        writer = SolutionWriter(start_date, builder.num_days, pattern.shift_names, names)
+        writer.write(os.path.join(summary['directory'], pattern.solution_prefix + '0.csv'), roster)
+        writer.close()
+
+
+def run_batch(scenarios, defaults, output_dir, processes=None, num_workers=None):
+    """Solves the scenarios across a pool of processes, the search workers
+    of the cores split between them. Returns the summary rows in the order
+    of the scenarios, also written to output_dir/summary.csv."""
+    processes = max(1, min(len(scenarios), processes or os.cpu_count() or 1))
+    num_workers = num_workers or max(1, (os.cpu_count() or 1) // processes)
+    tasks = [(scenario, defaults, output_dir, num_workers) for scenario in scenarios]
+    os.makedirs(output_dir, exist_ok=True)
+    rows = {}
+    pool = multiprocessing.Pool(processes)
+    try:
+        for summary in pool.imap_unordered(run_scenario, tasks):
+            rows[summary['scenario']] = summary
+            print('%s: %s in %.1f s' % (summary['scenario'], summary['status'], summary['wall_time']))
+    finally:
+        pool.terminate()
+        pool.join()
+    rows = [rows[scenario['name']] for scenario in scenarios]
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', newline='') as table:
+        writer = csv.DictWriter(table, SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def print_summary(rows):
+    print('%-20s %-10s %8s %9s %6s %6s %6s %6s %10s' % ('scenario', 'status', 'wall s', 'objective', 'total',
+                                                       'sunday', 'prima', 'second', 'violations'))
+    for row in rows:
+        print('%-20s %-10s %8.1f %9s %6s %6s %6s %6s %10s' % (
+            row['scenario'][:20], row['status'][:10], row['wall_time'],
+            '%g' % row['objective'] if 'objective' in row else '-',
+            *[row.get(column, '-') for column in SUMMARY_COLUMNS[4:9]]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solves a table of roster scenarios in parallel.')
+    parser.add_argument('scenarios', help='.csv table or workbook of the scenarios, columns: %s' % ', '.join(COLUMNS))
+    parser.add_argument('--output_dir', default='scenarios',
+                        help='directory of the scenario directories and of summary.csv')
+    parser.add_argument('--processes', type=int, help='scenarios solved at the same time (default: cores)')
+    parser.add_argument('--workers', type=int, help='search workers of each scenario (default: cores / processes)')
+    parser.add_argument('--time_limit', type=float, default=60.0,
+                        help='time budget in seconds of the scenarios without a time_limit')
+    args = parser.parse_args(argv)
+
+    from roster_model import read_config
+    scenarios = read_scenarios(args.scenarios)
+    if not scenarios:
+        print('%s has no scenarios' % args.scenarios)
+        return 1
+    num_nurses, start_date, num_weeks, operators_name_list, _ = read_config()
+    # the first operator of the workbook is the restricted one, as in run()
+    defaults = {'start_date': start_date, 'weeks': num_weeks, 'operators': operators_name_list[:num_nurses],
+                'restricted': operators_name_list[0], 'time_limit': args.time_limit}
+    rows = run_batch(scenarios, defaults, args.output_dir, args.processes, args.workers)
+    print()
+    print_summary(rows)
+    print('Summary written to %s' % os.path.join(args.output_dir, 'summary.csv'))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
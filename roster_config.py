@@ -0,0 +1,153 @@
+from datetime import datetime
+import hashlib
+import json
+import os
+
+CONFIG_FILE = 'TurniConfig.xlsx'
+# Bumped when the compiled form changes, so that older caches are rebuilt.
+CACHE_VERSION = 2
+
+PARAMETERS_SHEET = 'Parametri'
+# The demand sheets of the shift patterns start with this name.
+DEMAND_SHEET = 'Copertura'
+
+START_DATE = 'DATA INIZIO (GG/MM/AAAA)'
+NUM_WEEKS = 'NUM SETTIMANE'
+NUM_OPERATORS = 'NUM OPERATORI'
+OPERATORS = 'LISTA OPERATORI (lista nomi divisi da virgola)'
+
+
+class ConfigError(ValueError):
+    """The configuration workbook cannot be used."""
+
+
+def cache_file(filename):
+    """Returns the file of the compiled form of a workbook, next to it."""
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, '.%s.cache.json' % name)
+
+
+def load_config(filename=CONFIG_FILE, use_cache=True):
+    """Returns the compiled form of a configuration workbook.
+
+    The compiled form is a dict with the {PARAMETRO: VALORE} parameters of
+    the Parametri sheet and the columns and rows of every demand sheet, with
+    dates as dd/mm/yyyy strings. It is cached as JSON next to the workbook:
+    a cache whose modification time and size match the workbook is used
+    as is, otherwise it is still used if the sha256 of the workbook did not
+    change. Only a workbook that actually changed is parsed again, and only
+    then pandas is imported. Raises ConfigError if the workbook is invalid.
+    """
+    stat = os.stat(filename)
+    cached = _read_cache(filename) if use_cache else None
+    if cached and (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+        return cached['config']
+    digest = _sha256(filename)
+    if cached and cached['sha256'] == digest:
+        config = cached['config']
+    else:
+        config = compile_workbook(filename)
+        validate(config)
+    if use_cache:
+        _write_cache(filename, {'version': CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                'sha256': digest, 'config': config})
+    return config
+
+
+def compile_workbook(filename):
+    """Parses the workbook into its compiled form."""
+    import pandas as pd
+    try:
+        workbook = pd.ExcelFile(filename)
+    except ValueError as e:
+        raise ConfigError('%s is not a workbook: %s' % (filename, e))
+    if PARAMETERS_SHEET not in workbook.sheet_names:
+        raise ConfigError('%s has no %s sheet' % (filename, PARAMETERS_SHEET))
+    frame = workbook.parse(PARAMETERS_SHEET)
+    missing = [column for column in ('PARAMETRO', 'VALORE') if column not in frame.columns]
+    if missing:
+        raise ConfigError('Sheet %s has no column %s' % (PARAMETERS_SHEET, ', '.join(missing)))
+    parameters = {}
+    for name, value in zip(frame['PARAMETRO'], frame['VALORE']):
+        if isinstance(name, str):
+            parameters[name.strip()] = _plain(value)
+    demand = {}
+    for sheet in workbook.sheet_names:
+        if sheet.startswith(DEMAND_SHEET):
+            frame = workbook.parse(sheet)
+            demand[sheet] = {'columns': [str(column) for column in frame.columns],
+                             'rows': [[_plain(value) for value in row] for row in frame.itertuples(index=False)]}
+    return {'parameters': parameters, 'demand': demand}
+
+
+def validate(config):
+    """Checks the parameters read by the roster scripts, and that every
+    shift of the demand sheets needs no operator or one: a roster has one
+    operator per shift."""
+    parameters = config['parameters']
+    missing = [name for name in (START_DATE, NUM_WEEKS, NUM_OPERATORS, OPERATORS) if parameters.get(name) is None]
+    if missing:
+        raise ConfigError('Missing parameters: %s' % ', '.join(missing))
+    try:
+        datetime.strptime(str(parameters[START_DATE]), '%d/%m/%Y')
+    except ValueError:
+        raise ConfigError('%s is not a dd/mm/yyyy date: %s' % (START_DATE, parameters[START_DATE]))
+    for name in (NUM_WEEKS, NUM_OPERATORS):
+        value = parameters[name]
+        if not isinstance(value, (int, float)) or value != int(value) or value < 1:
+            raise ConfigError('%s must be a positive integer, not %s' % (name, value))
+    names = str(parameters[OPERATORS]).split(',')
+    if len(names) < parameters[NUM_OPERATORS]:
+        raise ConfigError('%s has %i names for %i operators' % (OPERATORS, len(names),
+                                                                   parameters[NUM_OPERATORS]))
+    for sheet, table in config['demand'].items():
+        for row in table['rows']:
+            cells = dict(zip(table['columns'], row))
+            for column, value in cells.items():
+                if column != 'GIORNO' and value not in (None, 0, 1):
+                    raise ConfigError('Sheet %s, %s %s: the demand of a shift is 0 or 1, not %s' % (
+                        sheet, cells.get('GIORNO'), column, value))
+
+
+def _plain(value):
+    # JSON friendly cell value
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y')
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as workbook:
+        for block in iter(lambda: workbook.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_cache(filename):
+    try:
+        with open(cache_file(filename)) as cache:
+            cached = json.load(cache)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(filename, cached):
+    # written aside and renamed, so that a concurrent run never reads half a cache
+    path = cache_file(filename)
+    temporary = '%s.%i' % (path, os.getpid())
+    try:
+        with open(temporary, 'w') as cache:
+            json.dump(cached, cache)
+        os.replace(temporary, path)
+    except OSError as e:
+        print('Cannot write the configuration cache %s: %s' % (path, e))
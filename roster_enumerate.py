@@ -0,0 +1,139 @@
+from ortools.sat.python import cp_model
+from collections import OrderedDict
+import hashlib
+import queue
+import threading
+import numpy as np
+from roster_model import canonical_roster, roster_from_solution
+
+
+class RosterEnumerator(object):
+    """Streams the distinct rosters of a model.
+
+    Two rosters that only differ by a relabeling of interchangeable
+    operators are the same roster: each solution is reduced to the
+    fingerprint of its canonical roster and dropped if the fingerprint was
+    already seen. With min_distance, a roster is also dropped when its
+    canonical roster is closer than min_distance shifts (Hamming distance)
+    to one of the rosters emitted before.
+
+    Memory does not grow with the length of the enumeration: only the last
+    max_fingerprints fingerprints are remembered, least recently seen first
+    out, and the distance is measured against the last max_kept emitted
+    rosters.
+    """
+
+    def __init__(self, index, groups, min_distance=0, max_fingerprints=100000, max_kept=1000):
+        self._index = index
+        self._groups = groups
+        self.min_distance = min_distance
+        self.max_fingerprints = max_fingerprints
+        self._fingerprints = OrderedDict()
+        self._kept = np.zeros((max_kept,) + index.shape[1:], dtype=np.int16)
+        self._num_kept = 0
+        self.solutions = 0
+        self.duplicates = 0
+        self.too_close = 0
+
+    def accept(self, roster):
+        """Returns the canonical roster if roster is new and diverse enough,
+        None otherwise."""
+        self.solutions += 1
+        canonical = canonical_roster(roster, self._groups)
+        fingerprint = hashlib.blake2b(canonical.tobytes(), digest_size=16).digest()
+        if fingerprint in self._fingerprints:
+            self._fingerprints.move_to_end(fingerprint)
+            self.duplicates += 1
+            return None
+        self._fingerprints[fingerprint] = None
+        if len(self._fingerprints) > self.max_fingerprints:
+            self._fingerprints.popitem(last=False)
+        kept = self._kept[:min(self._num_kept, len(self._kept))]
+        if self.min_distance and len(kept) and (kept != canonical).sum(axis=(1, 2)).min() < self.min_distance:
+            self.too_close += 1
+            return None
+        self._kept[self._num_kept % len(self._kept)] = canonical
+        self._num_kept += 1
+        return canonical
+
+    def rosters(self, model, settings=None, limit=None, queue_size=16):
+        """Yields the (day, shift) rosters of the model as they are found.
+
+        The search runs in a background thread with a single worker, as
+        enumerating solutions requires, and waits while queue_size rosters
+        are not consumed yet. It stops after limit rosters, or when the
+        generator is closed.
+        """
+        solver = cp_model.CpSolver()
+        if settings is not None:
+            settings.apply(solver, num_workers=1)
+        solver.parameters.num_search_workers = 1
+        solver.parameters.enumerate_all_solutions = True
+        found = queue.Queue(queue_size)
+        stop = threading.Event()
+        enumerator = self
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    found.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        class Callback(cp_model.CpSolverSolutionCallback):
+
+            def on_solution_callback(self):
+                roster = roster_from_solution(self.Response().solution, enumerator._index)
+                if enumerator.accept(roster) is not None:
+                    put(roster)
+                if stop.is_set():
+                    self.StopSearch()
+
+        def search():
+            try:
+                solver.Solve(model, Callback())
+            finally:
+                put(None)
+
+        thread = threading.Thread(target=search, daemon=True)
+        thread.start()
+        emitted = 0
+        try:
+            while limit is None or emitted < limit:
+                roster = found.get()
+                if roster is None:
+                    break
+                yield roster
+                emitted += 1
+        finally:
+            stop.set()
+            solver.StopSearch()
+            thread.join()
+
+
+def diverse_rosters(model, shifts, k, min_distance, settings=None):
+    """Yields up to k rosters, each differing from all the previous ones in
+    at least min_distance shifts.
+
+    After each solve the model gets a constraint that at most all but
+    min_distance of the assignments of the new roster are kept, and is
+    solved again hinted with the last roster, which the solver repairs
+    instead of starting from scratch. Stops early when no further roster
+    exists or the time limit of a solve runs out.
+    """
+    index = shifts.index()
+    for _ in range(k):
+        solver = cp_model.CpSolver()
+        if settings is not None:
+            settings.apply(solver)
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return
+        roster = roster_from_solution(solver.ResponseProto().solution, index)
+        yield roster
+        kept = [shifts[(int(n), d, s)] for (d, s), n in np.ndenumerate(roster) if n >= 0]
+        model.Add(cp_model.LinearExpr.Sum(kept) <= len(kept) - min_distance)
+        model.ClearHints()
+        for key, var in shifts.items():
+            model.AddHint(var, int(roster[key[1], key[2]] == key[0]))
@@ -0,0 +1,776 @@
+from ortools.sat import cp_model_pb2
+from ortools.sat.python import cp_model
+import argparse
+from datetime import datetime
+import itertools
+import numpy as np
+import os
+import roster_config
+from roster_output import SolutionWriter
+from roster_telemetry import Telemetry
+from roster_transitions import TransitionMatrix, add_labels
+from roster_verify import print_violations, verify_roster
+import solver_settings
+code_version = '1.0.0'
+
+DEFAULT_OPERATORS = ['MOLINARO', 'SUDATI', 'TRECCOZZI', 'CRESCENZI', 'MANDOLESI', 'PALESTINI E.', 'VALLORANI',
+                     'MARONI',
+                     'BIANCHINI', 'CAGNAZZO', 'NEGREA', 'PALESTINI F.', 'CAMELA', 'FERIOZZI', 'CILENTI',
+                     'MICLAUS',
+                     'CENSORI', 'COSSETI', 'NOVELLI', 'OP1', 'OP2', 'OP3']
+
+# Fairness kinds balanced by the soft fairness objective, with their default
+# weights; the order is the priority of the lexicographic objective.
+FAIRNESS_WEIGHTS = {'total': 4, 'sunday': 2, 'prima': 1, 'seconda': 1}
+
+# Rows of the demand sheets, monday first.
+WEEKDAY_NAMES = ['LUNEDI', 'MARTEDI', 'MERCOLEDI', 'GIOVEDI', 'VENERDI', 'SABATO', 'DOMENICA']
+
+
+class ShiftPattern(object):
+    """Shift layout of a roster.
+
+    shift_names: one name per shift of the day.
+    weekday_shifts: shifts covered from monday to saturday, the other ones
+      are covered on sunday only.
+    restricted_shifts: shifts the restricted operators never work.
+    saturday_shifts: shifts counted by the consecutive saturdays rule.
+    prima_shifts, seconda_shifts: shifts balanced as "di prima" and
+      "di seconda", None to skip the balance.
+    solution_prefix: prefix of the solution csv files.
+    demand_sheet: sheet of TurniConfig.xlsx with the demand of the pattern,
+      see read_demand().
+    """
+
+    def __init__(self, shift_names, weekday_shifts, restricted_shifts, saturday_shifts, prima_shifts=None,
+                 seconda_shifts=None, solution_prefix='Solution_', demand_sheet='Copertura'):
+        self.shift_names = list(shift_names)
+        self.num_shifts = len(self.shift_names)
+        self.weekday_shifts = list(weekday_shifts)
+        self.restricted_shifts = list(restricted_shifts)
+        self.saturday_shifts = list(saturday_shifts)
+        self.prima_shifts = prima_shifts
+        self.seconda_shifts = seconda_shifts
+        self.solution_prefix = solution_prefix
+        self.demand_sheet = demand_sheet
+
+    @property
+    def shifts_per_week(self):
+        return 6 * len(self.weekday_shifts) + self.num_shifts
+
+    def weekly_demand(self):
+        """Returns the default (weekday, shift) demand: one operator on each
+        weekday shift from monday to saturday, on every shift on sunday."""
+        demand = np.zeros((7, self.num_shifts), dtype=np.int16)
+        demand[:6, self.weekday_shifts] = 1
+        demand[6] = 1
+        return demand
+
+
+FOUR_SHIFTS = ShiftPattern(['Mattina 1', 'Mattina 2', 'Sera 1', 'Sera 2'], weekday_shifts=[2, 3],
+                           restricted_shifts=[2, 3], saturday_shifts=[2, 3], prima_shifts=[0, 2],
+                           seconda_shifts=[1, 3])
+TWO_SHIFTS = ShiftPattern(['Mattina 1', 'Sera 1'], weekday_shifts=[1], restricted_shifts=[1],
+                          saturday_shifts=[0, 1], solution_prefix='Solution_1xS_', demand_sheet='Copertura 1xS')
+PATTERNS = [FOUR_SHIFTS, TWO_SHIFTS]
+
+
+def pattern_for_shifts(shift_names):
+    """Returns the pattern with the given shift names."""
+    for pattern in PATTERNS:
+        if pattern.shift_names == list(shift_names):
+            return pattern
+    raise ValueError('No shift pattern with shifts %s' % ', '.join(shift_names))
+
+
+class NursesPartialSolutionPrinter(cp_model.CpSolverSolutionCallback):
+    """Print intermediate solutions.
+
+    The shift literals are read from the solver response in one batch into a
+    (nurse, day, shift) int8 array; formatting and writing the csv is left to
+    the SolutionWriter thread. Solution i is written to
+    <solution_prefix><i>.csv, the search stops after limit solutions. With
+    limit None the search goes on and, with overwrite, every improving
+    solution replaces <solution_prefix>0.csv.
+    """
+
+    def __init__(self, shifts, num_nurses, num_tot_days, num_shifts, writer, solution_prefix='Solution_',
+                 telemetry=None, limit=1, overwrite=False):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self._overwrite = overwrite
+        self._telemetry = telemetry
+        self._solution_count = 0
+        self._solution_limit = limit
+        self._solution_prefix = solution_prefix
+        self._writer = writer
+        self._index = shift_index(shifts, num_nurses, num_tot_days, num_shifts)
+        self._values = np.zeros((num_nurses, num_tot_days, num_shifts), dtype=np.int8)
+        self.roster = None
+
+    def on_solution_callback(self):
+        # the other search workers can still report solutions after
+        # StopSearch()
+        if self._solution_limit is not None and self._solution_count >= self._solution_limit:
+            return
+        if self._telemetry is not None:
+            self._telemetry.solution(self)
+        solution = np.append(np.asarray(self.Response().solution, dtype=np.int64), 0)
+        np.take(solution, self._index, out=self._values, mode='wrap')
+        self.roster = roster_from_values(self._values)
+        number = 0 if self._overwrite else self._solution_count
+        info = {'wall_time': self.WallTime(), 'conflicts': self.NumConflicts(), 'branches': self.NumBranches()}
+        if self._overwrite:
+            info['objective'] = self.ObjectiveValue()
+        self._writer.write(self._solution_prefix + str(number) + '.csv', self.roster, info)
+        self._solution_count += 1
+        if self._solution_limit is not None and self._solution_count >= self._solution_limit:
+            self._writer.finish()
+            self.StopSearch()
+
+    def solution_count(self):
+        return self._solution_count
+
+
+def shift_index(shifts, num_nurses, num_days, num_shifts):
+    """Returns the (nurse, day, shift) array of the model indices of shifts,
+    -1 for the triples without a variable.
+
+    Index it into the solution values with a 0 appended, so that -1 reads 0.
+    """
+    index = np.full((num_nurses, num_days, num_shifts), -1, dtype=np.int64)
+    for (n, d, s), var in shifts.items():
+        index[n, d, s] = var.Index()
+    return index
+
+
+class ShiftVariables(dict):
+    """Sparse store of the shift variables, {(nurse, day, shift): BoolVar}.
+
+    Only the triples set in the (nurse, day, shift) available array get a
+    variable; the ones that could never be 1 are not in the model at all.
+    Constraint builders read the store through literals(), which skips the
+    missing triples.
+    """
+
+    def __init__(self, model, available):
+        dict.__init__(self)
+        self.shape = np.shape(available)
+        for n, d, s in np.argwhere(available).tolist():
+            self[(n, d, s)] = model.NewBoolVar('shift_op%id%is%i' % (n, d, s))
+
+    @classmethod
+    def from_index(cls, model, index):
+        """Rebuilds the store of a model read back from its proto, from the
+        shift_index() array of the store it was built with."""
+        shifts = cls(model, np.zeros(np.shape(index), dtype=bool))
+        for n, d, s in np.argwhere(index >= 0).tolist():
+            shifts[(n, d, s)] = model.GetBoolVarFromProtoIndex(int(index[n, d, s]))
+        return shifts
+
+    def literals(self, n, days, shift_list):
+        """Returns the variables of operator n on days and shift_list."""
+        return [self[(n, d, s)] for d in days for s in shift_list if (n, d, s) in self]
+
+    def covering(self, d, s):
+        """Returns the variables of the operators that can work shift s of
+        day d."""
+        return [self[(n, d, s)] for n in range(self.shape[0]) if (n, d, s) in self]
+
+    def index(self):
+        """Returns shift_index() of the store."""
+        return shift_index(self, *self.shape)
+
+
+def roster_from_solution(solution, index):
+    """Builds the (day, shift) roster from the values of all the model
+    variables, as in CpSolverResponse.solution."""
+    return roster_from_values(np.append(np.asarray(solution, dtype=np.int64), 0)[index])
+
+
+def canonical_roster(roster, groups):
+    """Relabels the operators of each group of interchangeable operators by
+    order of first appearance, so that rosters that only differ by a
+    relabeling get the same canonical roster."""
+    flat = np.asarray(roster).ravel()
+    canonical = flat.copy()
+    for group in groups:
+        in_group = np.isin(flat, group)
+        members, first = np.unique(flat[in_group], return_index=True)
+        relabel = np.arange(max(group) + 1, dtype=flat.dtype)
+        relabel[members[np.argsort(first)]] = sorted(group)[:len(members)]
+        canonical[in_group] = relabel[flat[in_group]]
+    return canonical.reshape(np.shape(roster))
+
+
+def roster_from_values(values):
+    """Turns a (nurse, day, shift) 0/1 array into a (day, shift) array of nurse
+    indices, -1 where the shift is not covered."""
+    roster = values.argmax(axis=0).astype(np.int16)
+    roster[values.max(axis=0) == 0] = -1
+    return roster
+
+
+def day_of(start_date, date):
+    """Index of a dd/mm/yyyy date in a roster starting on start_date."""
+    return (datetime.strptime(date, '%d/%m/%Y') - datetime.strptime(start_date, '%d/%m/%Y')).days
+
+
+def demand_matrix(weekly, num_weeks, overrides=None):
+    """Repeats a (weekday, shift) demand over num_weeks weeks.
+
+    overrides maps day indices to the demand row of that day, e.g. the
+    sunday row for a holiday. Returns a (day, shift) int16 array.
+    """
+    demand = np.tile(np.asarray(weekly, dtype=np.int16), (num_weeks, 1))
+    for d, row in (overrides or {}).items():
+        if 0 <= d < len(demand):
+            demand[d] = row
+    return demand
+
+
+def read_demand(pattern, start_date, num_weeks, filename=roster_config.CONFIG_FILE):
+    """Reads the (day, shift) demand of a pattern from its demand sheet.
+
+    The sheet has a GIORNO column and one column per shift name. A row per
+    weekday name (LUNEDI to DOMENICA) gives the weekly demand, a row with a
+    date overrides that day, e.g. to cover a holiday like a sunday. Weekdays
+    missing from the sheet, or the whole sheet, keep pattern.weekly_demand().
+    A shift needs no operator or one; any other demand raises
+    roster_config.ConfigError.
+    """
+    weekly = pattern.weekly_demand()
+    overrides = {}
+    sheet = None
+    if os.path.exists(filename):
+        sheet = roster_config.load_config(filename)['demand'].get(pattern.demand_sheet)
+    if sheet is not None:
+        columns = sheet['columns']
+        missing = [name for name in ['GIORNO'] + pattern.shift_names if name not in columns]
+        if missing:
+            raise roster_config.ConfigError('Sheet %s has no column %s' % (pattern.demand_sheet, ', '.join(missing)))
+        for values in sheet['rows']:
+            cells = dict(zip(columns, values))
+            row = [cells[name] or 0 for name in pattern.shift_names]
+            day = str(cells['GIORNO']).strip().upper().replace('\u00cc', 'I')
+            if day in WEEKDAY_NAMES:
+                weekly[WEEKDAY_NAMES.index(day)] = row
+            else:
+                overrides[day_of(start_date, day)] = row
+    demand = demand_matrix(weekly, num_weeks, overrides)
+    if not np.isin(demand, (0, 1)).all():
+        raise roster_config.ConfigError('Sheet %s: the demand of a shift is 0 or 1, not %s' % (
+            pattern.demand_sheet, ', '.join(str(value) for value in np.setdiff1d(demand, (0, 1)))))
+    return demand
+
+
+class RosterModelBuilder(object):
+    """Builds the CP-SAT roster model of a shift pattern.
+
+    Day, sunday, saturday and week index lists are computed once; build()
+    then walks the operators a single time and adds all their constraints.
+    Operators in restricted work only the shifts left free by
+    pattern.restricted_shifts and are excluded from the fairness bounds.
+
+    With break_symmetry the operators of each group of interchangeable
+    operators are ordered by their first worked (day, shift) slot, so the
+    solver does not explore rosters that only differ by a relabeling.
+
+    demand is the (day, shift) number of operators on each shift, by
+    default pattern.weekly_demand() every week. The shift variables are a
+    ShiftVariables store over availability(): there are none for the shifts
+    without demand, nor for the restricted shifts of restricted operators.
+
+    The rest windows are one AddAtMostOne per window, the pairwise clauses
+    of the original scripts without compact_transitions, or one
+    roster_transitions automaton per operator and day list with
+    automaton_transitions.
+
+    With soft_fairness the regular operators have no total, sunday, prima
+    and seconda bounds: build() creates instead the spread, max - min over
+    the regular operators, of each kind in self.spreads, and
+    fairness_objective() weighs them.
+    """
+
+    def __init__(self, pattern, num_nurses, num_weeks, restricted=(0,), compact_transitions=True,
+                 break_symmetry=True, automaton_transitions=False, demand=None, soft_fairness=False):
+        self.pattern = pattern
+        self.num_nurses = int(num_nurses)
+        self.num_weeks = int(num_weeks)
+        self.num_days = self.num_weeks * 7
+        if demand is None:
+            demand = demand_matrix(pattern.weekly_demand(), self.num_weeks)
+        self.demand = np.asarray(demand, dtype=np.int16)
+        if self.demand.shape != (self.num_days, pattern.num_shifts):
+            raise ValueError('The demand is %s, not (%i days, %i shifts)' % (
+                self.demand.shape, self.num_days, pattern.num_shifts))
+        if not np.isin(self.demand, (0, 1)).all():
+            # a roster holds one operator per (day, shift)
+            raise ValueError('The demand of a shift is 0 or 1')
+        self.restricted = list(restricted)
+        self.compact_transitions = compact_transitions
+        self.automaton_transitions = automaton_transitions
+        self.break_symmetry = break_symmetry
+        self.soft_fairness = soft_fairness
+        self.spreads = {}
+
+        self.nurses = list(range(self.num_nurses))
+        self.regular_nurses = [n for n in self.nurses if n not in self.restricted]
+        self.shift_list = list(range(pattern.num_shifts))
+        self.days = list(range(self.num_days))
+        self.weekdays = [d for d in self.days if d % 7 != 6]
+        self.sundays = [d for d in self.days if d % 7 == 6]
+        self.saturdays = [d for d in self.days if d % 7 == 5]
+        self.weeks = [self.days[w * 7:(w + 1) * 7] for w in range(self.num_weeks)]
+
+        # fairness bounds
+        weekend_shifts_to_assing_M = 2 * self.num_weeks
+        self.min_we_shifts_per_nurse_M = max(2, (weekend_shifts_to_assing_M // self.num_nurses))
+        self.max_we_shifts_per_nurse_M = self._upper(weekend_shifts_to_assing_M, self.min_we_shifts_per_nurse_M)
+
+        tot_shifts_to_assign_per_nurse = int(self.demand.sum())
+        self.min_shifts_per_nurse, self.max_shifts_per_nurse = self._regular_share(tot_shifts_to_assign_per_nurse)
+        self.num_turni_di_prima = (self.max_shifts_per_nurse // 2)
+        self.num_turni_di_seconda = self.max_shifts_per_nurse - self.num_turni_di_prima
+
+        weekend_shifts_to_assing = int(self.demand[self.sundays].sum())
+        self.min_we_shifts_per_nurse, self.max_we_shifts_per_nurse = self._regular_share(weekend_shifts_to_assing)
+
+        self.max_shifts_per_nurse_per_week = (self.max_shifts_per_nurse // self.num_weeks) + 1
+
+    def _regular_share(self, total):
+        # the restricted operators only work their sunday shifts, the regular
+        # operators split what is left of total
+        if not self.restricted:
+            return total // self.num_nurses, self._upper(total, total // self.num_nurses)
+        num_regular = len(self.regular_nurses)
+        left_min = total - len(self.restricted) * self.max_we_shifts_per_nurse_M
+        left_max = total - len(self.restricted) * self.min_we_shifts_per_nurse_M
+        return left_min // num_regular, -(-left_max // num_regular)
+
+    def _upper(self, total, lower):
+        if total % self.num_nurses == 0:
+            return lower
+        return lower + 1
+
+    def print_bounds(self):
+        print("Generated weeks {}".format(self.num_weeks))
+        if self.soft_fairness:
+            print("Soft fairness on {}".format(', '.join(self.fairness_kinds())))
+            return
+        print("Min shifts per nurse {}".format(self.min_shifts_per_nurse))
+        print("Max shifts per nurse {}".format(self.max_shifts_per_nurse))
+        if self.pattern.prima_shifts:
+            print("Max shifts per nurse di Prima {}".format(self.num_turni_di_prima))
+            print("Max shifts per nurse di Seconda {}".format(self.num_turni_di_seconda))
+        print("Min WE shifts per nurse {}".format(self.min_we_shifts_per_nurse))
+        print("Max WE shifts per nurse {}".format(self.max_we_shifts_per_nurse))
+
+    def availability(self):
+        """Returns the (nurse, day, shift) bool array of the triples that can
+        be worked."""
+        available = np.repeat((self.demand > 0)[np.newaxis], self.num_nurses, axis=0)
+        for n in self.restricted:
+            available[n][:, self.pattern.restricted_shifts] = False
+        return available
+
+    def build(self):
+        """Returns the model and the ShiftVariables store."""
+        model = cp_model.CpModel()
+        shifts = ShiftVariables(model, self.availability())
+
+        # coverage, the shifts without demand have no variables
+        for d, s in np.argwhere(self.demand > 0).tolist():
+            model.Add(sum(shifts.covering(d, s)) == int(self.demand[d, s]))
+
+        for n in self.nurses:
+            self._add_nurse_constraints(model, shifts, n)
+        if self.soft_fairness:
+            self._add_spreads(model, shifts)
+        if self.break_symmetry:
+            self._add_symmetry_breaking(model, shifts)
+        return model, shifts
+
+    def symmetry_groups(self):
+        """Returns the groups of two or more operators sharing the same
+        constraints."""
+        groups = {}
+        for n in self.nurses:
+            groups.setdefault(n in self.restricted, []).append(n)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _add_symmetry_breaking(self, model, shifts):
+        # first_slot[n] is the first (day, shift) slot worked by n, or
+        # num_slots if n never works. Every slot is covered by at most one
+        # operator, so sorting any roster by first slot is a relabeling.
+        num_shifts = self.pattern.num_shifts
+        num_slots = self.num_days * num_shifts
+        for group in self.symmetry_groups():
+            first_slots = []
+            for n in group:
+                first_slot = model.NewIntVar(0, num_slots, 'first_slot_op%i' % n)
+                model.AddMinEquality(first_slot, [num_slots] + [
+                    num_slots - (num_slots - d * num_shifts - s) * shifts[(n, d, s)]
+                    for d in self.days for s in self.shift_list if (n, d, s) in shifts])
+                first_slots.append(first_slot)
+            for i in range(len(first_slots) - 1):
+                model.Add(first_slots[i] <= first_slots[i + 1])
+
+    def fairness_kinds(self):
+        """Returns the count kinds balanced between the regular operators."""
+        if self.pattern.prima_shifts:
+            return ['total', 'sunday', 'prima', 'seconda']
+        return ['total', 'sunday']
+
+    def _add_spreads(self, model, shifts):
+        for kind in self.fairness_kinds():
+            counts = [self.count_expression(shifts, n, kind) for n in self.regular_nurses]
+            if not counts:
+                continue
+            most = model.NewIntVar(0, self.num_days, 'max_%s' % kind)
+            least = model.NewIntVar(0, self.num_days, 'min_%s' % kind)
+            model.AddMaxEquality(most, counts)
+            model.AddMinEquality(least, counts)
+            spread = model.NewIntVar(0, self.num_days, 'spread_%s' % kind)
+            model.Add(spread == most - least)
+            self.spreads[kind] = spread
+
+    def fairness_objective(self, weights=None):
+        """Returns the weighted sum of the spreads, FAIRNESS_WEIGHTS by
+        default; call it after build()."""
+        if weights is None:
+            weights = FAIRNESS_WEIGHTS
+        return sum(weights.get(kind, 0) * spread for kind, spread in self.spreads.items())
+
+    def _add_nurse_constraints(self, model, shifts, n):
+        pattern = self.pattern
+        shift_list = self.shift_list
+        restricted = n in self.restricted
+
+        # Each nurse works at most one shift per day.
+        for d in self.days:
+            model.AddAtMostOne(shifts.literals(n, [d], shift_list))
+
+        if restricted:
+            kinds = ['sunday']
+        elif self.soft_fairness:
+            kinds = []
+        else:
+            kinds = self.fairness_kinds()
+        for kind in kinds:
+            self._add_count_bounds(model, n, kind, self.count_expression(shifts, n, kind))
+        if not restricted:
+            # balance weeks
+            for week in self.weeks:
+                model.Add(sum(shifts.literals(n, week, shift_list)) <= self.max_shifts_per_nurse_per_week)
+            # a nurse that works on day d rests on the following 3 days
+            self._add_rest_windows(model, shifts, n, self.days, shift_list, 4)
+
+        # at most one worked sunday in every window of 4 consecutive sundays,
+        # the same for saturdays
+        self._add_rest_windows(model, shifts, n, self.sundays, shift_list, 4)
+        self._add_rest_windows(model, shifts, n, self.saturdays, pattern.saturday_shifts, 4)
+
+    def count_bounds(self, n, kind):
+        """Returns the (min, max) number of shifts of a kind for operator n.
+
+        kind is 'total', 'sunday', 'prima' or 'seconda'; None stands for no
+        bound, as for every kind of the regular operators with soft_fairness.
+        """
+        if kind == 'sunday' and n in self.restricted:
+            return self.min_we_shifts_per_nurse_M, self.max_we_shifts_per_nurse_M
+        if self.soft_fairness and kind in ('total', 'sunday', 'prima', 'seconda'):
+            return None, None
+        if kind == 'sunday':
+            return self.min_we_shifts_per_nurse, self.max_we_shifts_per_nurse
+        if kind == 'total':
+            return self.min_shifts_per_nurse, self.max_shifts_per_nurse
+        if kind == 'prima':
+            return None, self.num_turni_di_prima
+        if kind == 'seconda':
+            return None, self.num_turni_di_seconda
+        raise ValueError('Unknown count kind %s' % kind)
+
+    def count_expression(self, shifts, n, kind, days=None):
+        """Returns the number of shifts of a kind worked by n over days, all
+        the days by default."""
+        if days is None:
+            days = self.days
+        if kind == 'sunday':
+            days = [d for d in days if d % 7 == 6]
+        if kind == 'prima':
+            shift_list = self.pattern.prima_shifts
+        elif kind == 'seconda':
+            shift_list = self.pattern.seconda_shifts
+        else:
+            shift_list = self.shift_list
+        return sum(shifts.literals(n, days, shift_list))
+
+    def _add_count_bounds(self, model, n, kind, count):
+        lower, upper = self.count_bounds(n, kind)
+        if lower is not None:
+            model.Add(lower <= count)
+        if upper is not None:
+            model.Add(count <= upper)
+
+    def _add_rest_windows(self, model, shifts, n, days, shift_list, window):
+        if self.automaton_transitions:
+            # label 0 is rest, after a shift come window - 1 days of rest
+            transitions = TransitionMatrix([[0] * (len(shift_list) + 1)] * (len(shift_list) + 1), rest_label=0,
+                                           min_gap=window - 1)
+            transitions.add(model, add_labels(model, [shifts.literals(n, [d], shift_list) for d in days], 1))
+            return
+        for i in range(len(days) - window + 1):
+            window_days = days[i:i + window]
+            if self.compact_transitions:
+                model.AddAtMostOne(shifts.literals(n, window_days, shift_list))
+            else:
+                for k in range(1, window):
+                    for first, other in itertools.product(shifts.literals(n, window_days[:1], shift_list),
+                                                          shifts.literals(n, window_days[k:k + 1], shift_list)):
+                        model.AddBoolOr([first.Not(), other.Not()])
+
+
+
+def read_config(filename=roster_config.CONFIG_FILE):
+    """Reads start date, weeks and operators from TurniConfig.xlsx.
+
+    Also returns every {PARAMETRO: VALORE} row of the sheet, for the optional
+    parameters read by the other modules. Without the workbook the defaults
+    are used; an invalid workbook raises roster_config.ConfigError.
+    """
+    if not os.path.exists(filename):
+        print('%s not found, using the default parameters' % filename)
+        return 22, '07/06/2021', 10, list(DEFAULT_OPERATORS), {}
+    rows = roster_config.load_config(filename)['parameters']
+    return (int(rows[roster_config.NUM_OPERATORS]), rows[roster_config.START_DATE], int(rows[roster_config.NUM_WEEKS]),
+            rows[roster_config.OPERATORS].split(','), rows)
+
+
+def run(pattern, argv=None):
+    """Reads the configuration, builds the roster model and solves it."""
+    parser = argparse.ArgumentParser(description='Generates the roster and writes it to %s<n>.csv.'
+                                                 % pattern.solution_prefix)
+    parser.add_argument('--telemetry', help='file for the phase timings and the solutions time series '
+                                            '(.jsonl or .csv)')
+    parser.add_argument('--solutions', type=int, default=1,
+                        help='number of distinct rosters to write, more than 1 enumerates the solutions')
+    parser.add_argument('--diverse', action='store_true',
+                        help='with --solutions, solve again for each roster with a minimum distance from the '
+                             'rosters before, instead of enumerating the solutions')
+    parser.add_argument('--min_distance', type=int, default=0,
+                        help='with --solutions, shifts every roster changes from the rosters written before '
+                             '(with --diverse, default: a tenth of the shifts)')
+    parser.add_argument('--fingerprints', type=int, default=100000,
+                        help='with --solutions, rosters remembered to drop the relabelings of the same roster')
+    parser.add_argument('--fairness', choices=['hard', 'soft'], default='hard',
+                        help='hard bounds on the shifts of each operator, or minimize the spreads between the '
+                             'operators, writing every better roster to %s0.csv' % pattern.solution_prefix)
+    parser.add_argument('--fairness_weights', type=parse_weights, default=FAIRNESS_WEIGHTS,
+                        help='with --fairness soft, kind=weight pairs divided by commas (default: %s)'
+                             % ','.join('%s=%i' % item for item in FAIRNESS_WEIGHTS.items()))
+    parser.add_argument('--lexicographic', action='store_true',
+                        help='with --fairness soft, minimize the spreads one at a time by decreasing weight')
+    parser.add_argument('--model_cache', default='.roster_models',
+                        help='directory of the built models, reused while the configuration does not change')
+    parser.add_argument('--no_model_cache', action='store_true', help='always build the model')
+    parser.add_argument('--format', choices=['csv', 'npz', 'both'], default='csv',
+                        help='roster files to write: csv, the binary npz read by turni verify and repair, or both')
+    solver_settings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    print('Code version: ' + code_version)
+    telemetry = Telemetry(code_version=code_version, solution_prefix=pattern.solution_prefix)
+    with telemetry.phase('config'):
+        num_nurses, start_date, num_weeks, operators_name_list, config_rows = read_config()
+        settings = solver_settings.settings_from_args(args, config_rows)
+        demand = read_demand(pattern, start_date, num_weeks)
+    if args.fairness == 'soft':
+        # without the bounds, every solve needs the fairness objective
+        if args.solutions > 1 and not args.diverse:
+            parser.error('--fairness soft enumerates no solutions, use --diverse with --solutions')
+        if args.lexicographic and (settings.portfolio > 1 or args.solutions > 1):
+            parser.error('--lexicographic solves once, it does not go with --portfolio or --solutions')
+    with telemetry.phase('build'):
+        builder = RosterModelBuilder(pattern, num_nurses, num_weeks, demand=demand,
+                                     soft_fairness=args.fairness == 'soft')
+        builder.print_bounds()
+        if args.no_model_cache:
+            model, shifts = builder.build()
+            cached = False
+        else:
+            from roster_model_cache import build_cached
+            model, shifts, cached = build_cached(builder, args.model_cache)
+    telemetry.record('model', nurses=num_nurses, weeks=num_weeks, variables=len(model.Proto().variables),
+                     constraints=len(model.Proto().constraints), cached=cached)
+
+    writer = SolutionWriter(start_date, builder.num_days, pattern.shift_names, operators_name_list,
+                            formats=['csv', 'npz'] if args.format == 'both' else [args.format])
+    if builder.soft_fairness and (settings.portfolio > 1 or args.solutions > 1):
+        model.Minimize(builder.fairness_objective(args.fairness_weights))
+    if settings.portfolio > 1:
+        try:
+            with telemetry.phase('solve'):
+                result = solver_settings.solve_portfolio(model, settings)
+            if result is not None:
+                index = shifts.index()
+                roster = roster_from_solution(result['solution'], index)
+                writer.write(pattern.solution_prefix + '0.csv', roster)
+        finally:
+            with telemetry.phase('write'):
+                writer.close()
+        print()
+        print('Statistics')
+        if result is None:
+            telemetry.record('summary', status='UNKNOWN', seeds=settings.portfolio)
+            _write_telemetry(telemetry, args.telemetry)
+            print('  - no solution found by %i seeds' % settings.portfolio)
+            return cp_model.UNKNOWN
+        telemetry.record('summary', status=result['status_name'], **dict(
+            (k, v) for k, v in result.items() if k not in ('solution', 'status', 'status_name')))
+        _write_telemetry(telemetry, args.telemetry)
+        print('  - seed            : %i' % result['seed'])
+        print('  - status          : %s' % result['status_name'])
+        print('  - conflicts       : %i' % result['conflicts'])
+        print('  - branches        : %i' % result['branches'])
+        print('  - wall time       : %f s' % result['wall_time'])
+        if builder.soft_fairness:
+            print('  - objective       : %g' % result['objective'])
+        print_violations(roster, builder, start_date, operators_name_list)
+        return result['status']
+
+    if args.solutions > 1:
+        return _run_enumeration(args, builder, model, shifts, settings, writer, telemetry, start_date,
+                                operators_name_list)
+
+    # Creates the solver and solve.
+    solver = cp_model.CpSolver()
+    settings.apply(solver)
+    solution_printer = NursesPartialSolutionPrinter(shifts, num_nurses, builder.num_days, pattern.num_shifts,
+                                                    writer, pattern.solution_prefix, telemetry,
+                                                    limit=None if builder.soft_fairness else 1,
+                                                    overwrite=builder.soft_fairness)
+    try:
+        with telemetry.phase('solve'):
+            if builder.soft_fairness and args.lexicographic:
+                objectives = [builder.spreads[kind] for kind in sorted(
+                    builder.spreads, key=lambda kind: -args.fairness_weights.get(kind, 0))
+                    if args.fairness_weights.get(kind, 0) > 0]
+                status, response = solve_lexicographic(model, objectives, solver, solution_printer)
+            elif builder.soft_fairness:
+                status, response = solve_lexicographic(
+                    model, [builder.fairness_objective(args.fairness_weights)], solver, solution_printer)
+            else:
+                status = solver.SolveWithSolutionCallback(model, solution_printer)
+                response = solver.ResponseProto()
+    finally:
+        with telemetry.phase('write'):
+            writer.close()
+    telemetry.summary(response, status, solutions=solution_printer.solution_count())
+    _write_telemetry(telemetry, args.telemetry)
+    # Statistics.
+    print()
+    print('Statistics')
+    print('  - conflicts       : %i' % response.num_conflicts)
+    print('  - branches        : %i' % response.num_branches)
+    print('  - wall time       : %f s' % response.wall_time)
+    print('  - solutions found : %i' % solution_printer.solution_count())
+    for kind, spread in builder.spreads.items():
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print('  - %-16s: %i' % (kind + ' spread', response.solution[spread.Index()]))
+    if solution_printer.roster is not None:
+        print_violations(solution_printer.roster, builder, start_date, operators_name_list)
+    return status
+
+
+def parse_weights(text):
+    """Parses kind=weight pairs divided by commas into a dict."""
+    weights = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in FAIRNESS_WEIGHTS or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError('%s is not a kind=weight pair, kinds are %s' % (
+                item, ', '.join(FAIRNESS_WEIGHTS)))
+        weights[kind.strip()] = int(weight)
+    return weights
+
+
+def solve_lexicographic(model, objectives, solver, solution_callback=None):
+    """Minimizes the objectives one after the other.
+
+    A first solve without objective finds a roster quickly; then each
+    objective is minimized, hinted with the last solution, and bounded by
+    its optimum, or by the best value found in time, before the next one.
+    The time limit of the solver is the budget of all the solves. Returns
+    the status and a copy of the response of the last solve that found a
+    solution, or of the first one if none did: the solver holds the response
+    of the last solve, which may have found nothing.
+    """
+    time_limit = solver.parameters.max_time_in_seconds
+    start = datetime.now()
+    status = cp_model.UNKNOWN
+    response = cp_model_pb2.CpSolverResponse()
+    for objective in [None] + list(objectives):
+        if objective is not None:
+            model.Minimize(objective)
+        left = time_limit - (datetime.now() - start).total_seconds()
+        if left <= 0:
+            break
+        solver.parameters.max_time_in_seconds = left
+        if solution_callback is None:
+            level_status = solver.Solve(model)
+        else:
+            level_status = solver.SolveWithSolutionCallback(model, solution_callback)
+        if level_status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if objective is None:
+                status = level_status
+                response.CopyFrom(solver.ResponseProto())
+            break
+        status = level_status
+        response.CopyFrom(solver.ResponseProto())
+        if objective is not None:
+            model.Add(objective <= int(response.objective_value))
+        model.ClearHints()
+        hint = model.Proto().solution_hint
+        hint.vars.extend(range(len(model.Proto().variables)))
+        hint.values.extend(response.solution)
+    solver.parameters.max_time_in_seconds = time_limit
+    return status, response
+
+
+def _run_enumeration(args, builder, model, shifts, settings, writer, telemetry, start_date, operators_name_list):
+    from roster_enumerate import RosterEnumerator, diverse_rosters
+    enumerator = RosterEnumerator(shifts.index(), builder.symmetry_groups(), args.min_distance, args.fingerprints)
+    if args.diverse:
+        min_distance = args.min_distance or int(builder.demand.sum()) // 10
+        rosters = diverse_rosters(model, shifts, args.solutions, min_distance, settings)
+    else:
+        rosters = enumerator.rosters(model, settings, limit=args.solutions)
+    violations = 0
+    written = 0
+    try:
+        with telemetry.phase('solve'):
+            for roster in rosters:
+                writer.write(builder.pattern.solution_prefix + str(written) + '.csv', roster)
+                violations += len(verify_roster(roster, builder))
+                written += 1
+    finally:
+        with telemetry.phase('write'):
+            writer.close()
+    telemetry.record('summary', solutions=enumerator.solutions, written=written, duplicates=enumerator.duplicates,
+                     too_close=enumerator.too_close)
+    _write_telemetry(telemetry, args.telemetry)
+    print()
+    print('Statistics')
+    if not args.diverse:
+        print('  - solutions found : %i' % enumerator.solutions)
+        print('  - relabelings     : %i' % enumerator.duplicates)
+        print('  - too close       : %i' % enumerator.too_close)
+    print('  - rosters written : %i' % written)
+    print('  - violations      : %i' % violations)
+    return cp_model.FEASIBLE if written else cp_model.UNKNOWN
+
+
+def _write_telemetry(telemetry, filename):
+    if filename:
+        telemetry.write(filename)
+        print('Telemetry written to %s' % filename)
@@ -0,0 +1,93 @@
+from ortools.sat.python import cp_model
+import hashlib
+import json
+import os
+import numpy as np
+import ortools
+from roster_model import ShiftVariables
+
+CACHE_DIR = '.roster_models'
+# Bumped when the cached form changes, so that older entries are rebuilt.
+CACHE_VERSION = 1
+# The modules whose code builds the model: a change in any of them changes
+# the key.
+BUILDER_MODULES = ['roster_model.py', 'roster_transitions.py']
+
+
+def model_key(builder):
+    """Returns the cache key of the model of a RosterModelBuilder.
+
+    The key is the sha256 of the normalized inputs of build(): the shift
+    pattern, the number of operators and weeks, the demand matrix, which
+    the start date and the demand sheets select, and the builder options,
+    together with the OR-Tools version and the code of BUILDER_MODULES.
+    The operator names do not change the model and are not part of it.
+    """
+    pattern = builder.pattern
+    inputs = {
+        'version': CACHE_VERSION,
+        'ortools': ortools.__version__,
+        'shifts': pattern.shift_names,
+        'restricted_shifts': pattern.restricted_shifts,
+        'saturday_shifts': pattern.saturday_shifts,
+        'prima_shifts': pattern.prima_shifts,
+        'seconda_shifts': pattern.seconda_shifts,
+        'nurses': builder.num_nurses,
+        'weeks': builder.num_weeks,
+        'restricted': builder.restricted,
+        'options': [builder.compact_transitions, builder.automaton_transitions, builder.break_symmetry,
+                    builder.soft_fairness],
+        'demand': hashlib.sha256(np.ascontiguousarray(builder.demand).tobytes()).hexdigest(),
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in BUILDER_MODULES:
+        with open(os.path.join(directory, module), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def build_cached(builder, directory=CACHE_DIR):
+    """Returns (model, shifts, cached) like builder.build(), read from the
+    cache when the key of the model is there.
+
+    An entry is an .npz file named after the key, with the binary
+    CpModelProto, the shift_index() of the store and the proto indices of
+    the builder spreads; a model built here is added to the cache.
+    """
+    path = os.path.join(directory, model_key(builder) + '.npz')
+    loaded = _load(path, builder)
+    if loaded is not None:
+        return loaded + (True,)
+    model, shifts = builder.build()
+    _save(path, model, shifts, builder.spreads)
+    return model, shifts, False
+
+
+def _load(path, builder):
+    try:
+        with np.load(path) as entry:
+            model_bytes = entry['model'].tobytes()
+            index = entry['shifts']
+            spread_kinds = [str(kind) for kind in entry['spread_kinds']]
+            spread_vars = entry['spread_vars'].tolist()
+    except (OSError, KeyError, ValueError):
+        return None
+    model = cp_model.CpModel()
+    model.Proto().ParseFromString(model_bytes)
+    builder.spreads = dict((kind, model.GetIntVarFromProtoIndex(var)) for kind, var in zip(spread_kinds,
+                                                                                          spread_vars))
+    return model, ShiftVariables.from_index(model, index)
+
+
+def _save(path, model, shifts, spreads):
+    # written aside and renamed, so that a concurrent run never reads half an entry
+    temporary = '%s.%i.npz' % (path[:-len('.npz')], os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(temporary, model=np.frombuffer(model.Proto().SerializeToString(), dtype=np.uint8),
+                 shifts=shifts.index().astype(np.int32), spread_kinds=np.array(list(spreads), dtype=str),
+                 spread_vars=np.array([var.Index() for var in spreads.values()], dtype=np.int32))
+        os.replace(temporary, path)
+    except OSError as e:
+        print('Cannot write the model cache %s: %s' % (path, e))
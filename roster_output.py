@@ -0,0 +1,154 @@
+import atexit
+from collections import namedtuple
+import json
+import os
+import queue
+import struct
+import threading
+from datetime import datetime
+import zipfile
+import numpy as np
+import pandas as pd
+
+# Formats SolutionWriter can write, by file extension.
+FORMATS = ['csv', 'npz']
+
+# A roster read back from an .npz file; roster is memory-mapped.
+RosterFile = namedtuple('RosterFile', ['roster', 'start_date', 'shift_names', 'names', 'info'])
+
+
+class SolutionWriter(threading.Thread):
+    """Formats and writes rosters to csv off the solver thread.
+
+    Rosters are (day, shift) arrays of operator indices, -1 for uncovered
+    shifts. write() only queues them; the queue is bounded so a slow disk
+    slows down the search instead of filling up the memory. close() writes
+    what is still queued and stops the thread, it is also called at exit.
+
+    Each roster is written in every one of formats, the extension of the
+    file name replaced by the format: csv, or npz as in save_roster().
+    """
+
+    def __init__(self, start_date, num_days, shift_names, name_list, maxsize=16, formats=('csv',)):
+        threading.Thread.__init__(self, name='SolutionWriter', daemon=True)
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError('Unknown formats %s, use %s' % (', '.join(sorted(unknown)), ', '.join(FORMATS)))
+        self.formats = list(formats)
+        self.start_date = start_date
+        self.name_list = list(name_list)
+        date_time_obj = datetime.strptime(start_date, '%d/%m/%Y')
+        self.date_range = pd.date_range(date_time_obj, periods=num_days)
+        self.shifts_list = list(shift_names)
+        # the last entry is picked by the -1 of the uncovered shifts
+        self.names_list = np.array(list(name_list) + [None], dtype=object)
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+        self._lock = threading.Lock()
+        self.files_written = []
+        self.errors = []
+        self.start()
+        atexit.register(self.close)
+
+    def solution_frame(self, roster):
+        """Returns the roster as a DataFrame of dates and operator names."""
+        solution_array = pd.DataFrame(self.names_list[roster], columns=self.shifts_list)
+        solution_array.insert(0, 'Data', self.date_range.strftime('%d/%m/%Y'))
+        return solution_array
+
+    def write(self, filename, roster, info=None):
+        """Queues a roster; info is a dict of solver statistics kept by the
+        npz format.
+
+        Returns False, and drops the roster, once the writer is finished:
+        it is called from solver callbacks, where an exception would abort
+        the process.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            self._queue.put((filename, np.array(roster, copy=True), info))
+            return True
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            filename, roster, info = item
+            for extension in self.formats:
+                path = os.path.splitext(filename)[0] + '.' + extension
+                try:
+                    if extension == 'csv':
+                        self.solution_frame(roster).to_csv(path, index=False)
+                    else:
+                        save_roster(path, roster, self.start_date, self.shifts_list, self.name_list, info)
+                    self.files_written.append(path)
+                except Exception as e:
+                    print('Cannot write %s: %s' % (path, e))
+                    self.errors.append((path, e))
+
+    def finish(self):
+        """Stops accepting rosters, without waiting for the queued ones."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def close(self):
+        """Writes the queued rosters and waits for the thread to stop."""
+        self.finish()
+        if self.is_alive():
+            self.join()
+        atexit.unregister(self.close)
+
+
+def save_roster(filename, roster, start_date, shift_names, name_list, info=None):
+    """Writes a roster to an uncompressed .npz file.
+
+    The (day, shift) roster is an int16 array of operator indices, -1 for
+    uncovered shifts, next to the start date, the shift names, the operator
+    names and the info dict as JSON; nothing needs pickle to be read back.
+    """
+    np.savez(filename, roster=np.asarray(roster, dtype=np.int16), start_date=np.array(start_date),
+             shift_names=np.array(list(shift_names)), names=np.array(list(name_list)),
+             info=np.array(json.dumps(info or {})))
+
+
+def open_roster(filename, mmap=True):
+    """Reads a roster written by save_roster() into a RosterFile.
+
+    With mmap the roster array is mapped from the file instead of read, so
+    that many stored rosters can be opened without loading them.
+    """
+    with zipfile.ZipFile(filename) as archive:
+        metadata = {}
+        for key in ('start_date', 'shift_names', 'names', 'info'):
+            with archive.open(key + '.npy') as member:
+                metadata[key] = np.lib.format.read_array(member, allow_pickle=False)
+        entry = archive.getinfo('roster.npy')
+        if not mmap:
+            with archive.open(entry) as member:
+                roster = np.lib.format.read_array(member, allow_pickle=False)
+        else:
+            roster = _map_member(filename, archive.fp, entry)
+    return RosterFile(roster, str(metadata['start_date']), metadata['shift_names'].tolist(),
+                      metadata['names'].tolist(), json.loads(str(metadata['info'])))
+
+
+def _map_member(filename, npz, entry):
+    # the members of np.savez are stored uncompressed: the array data starts
+    # after the zip local header and the .npy header of the member
+    if entry.compress_type != zipfile.ZIP_STORED:
+        raise ValueError('%s of %s is compressed and cannot be mapped' % (entry.filename, filename))
+    npz.seek(entry.header_offset)
+    local_header = npz.read(30)
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    npz.seek(entry.header_offset + 30 + name_length + extra_length)
+    version = np.lib.format.read_magic(npz)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npz)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npz)
+    return np.memmap(filename, dtype=dtype, mode='r', offset=npz.tell(), shape=shape,
+                     order='F' if fortran_order else 'C')
@@ -0,0 +1,135 @@
+from ortools.sat.python import cp_model
+import argparse
+import numpy as np
+import pandas as pd
+from roster_model import RosterModelBuilder, code_version, day_of, pattern_for_shifts, read_config, \
+    read_demand, roster_from_solution
+from roster_output import SolutionWriter, open_roster
+from roster_verify import print_violations
+import solver_settings
+
+
+def load_roster(filename, operators_name_list):
+    """Reads a Solution_*.csv or Solution_*.npz file written by main.py or
+    main_1xS.py.
+
+    Returns the start date, the shift pattern and the (day, shift) roster of
+    operator indices, -1 for uncovered shifts.
+    """
+    if filename.endswith('.npz'):
+        return _load_npz_roster(filename, operators_name_list)
+    frame = pd.read_csv(filename, dtype=str, keep_default_na=False)
+    if 'Data' not in frame.columns:
+        raise ValueError('%s has no Data column' % filename)
+    pattern = pattern_for_shifts(frame.columns[1:])
+    if len(frame) % 7 != 0:
+        raise ValueError('%s has %i days, not a whole number of weeks' % (filename, len(frame)))
+    operators = {name: n for n, name in enumerate(operators_name_list)}
+    operators[''] = -1
+    cells = frame[pattern.shift_names].values
+    unknown = set(cells.ravel()) - set(operators)
+    if unknown:
+        raise ValueError('Unknown operators in %s: %s' % (filename, ', '.join(sorted(unknown))))
+    roster = np.vectorize(operators.get, otypes=[np.int16])(cells)
+    return frame['Data'].iloc[0], pattern, roster
+
+
+def _load_npz_roster(filename, operators_name_list):
+    stored = open_roster(filename)
+    pattern = pattern_for_shifts(stored.shift_names)
+    if stored.roster.ndim != 2 or stored.roster.shape[1] != pattern.num_shifts or len(stored.roster) % 7 != 0:
+        raise ValueError('%s has a %s roster, not whole weeks of %i shifts' % (
+            filename, stored.roster.shape, pattern.num_shifts))
+    if stored.names == list(operators_name_list[:len(stored.names)]):
+        return stored.start_date, pattern, stored.roster
+    # stored with other operators: map them by name, the last entry is -1
+    unknown = set(stored.names) - set(operators_name_list)
+    used = set(np.unique(stored.roster[stored.roster >= 0]).tolist())
+    if any(stored.names[n] in unknown for n in used):
+        raise ValueError('Unknown operators in %s: %s' % (filename, ', '.join(sorted(
+            stored.names[n] for n in used if stored.names[n] in unknown))))
+    mapping = np.array([operators_name_list.index(name) if name in operators_name_list else -1
+                        for name in stored.names] + [-1], dtype=np.int16)
+    return stored.start_date, pattern, mapping[stored.roster]
+
+
+def parse_unavailable(text, start_date, operators_name_list):
+    """Parses NAME:dd/mm/yyyy or NAME:dd/mm/yyyy-dd/mm/yyyy into
+    (operator, first day, last day)."""
+    name, _, dates = text.rpartition(':')
+    if name not in operators_name_list:
+        raise ValueError('Unknown operator %s' % name)
+    first, _, last = dates.partition('-')
+    return operators_name_list.index(name), day_of(start_date, first), day_of(start_date, last or first)
+
+
+def add_repair(builder, model, shifts, roster, cutoff_day=0, unavailable=()):
+    """Turns the roster model into a repair of a previous roster.
+
+    Every shift variable is hinted with the previous roster, the days before
+    cutoff_day are pinned to it and the unavailable (operator, first day,
+    last day) periods are forbidden. The objective is the number of
+    assignments after the cutoff that differ from the previous roster.
+    """
+    kept = []
+    for (n, d, s), var in shifts.items():
+        previous = roster[d, s]
+        model.AddHint(var, int(n == previous))
+        if n != previous:
+            continue
+        if d < cutoff_day:
+            model.Add(var == 1)
+        else:
+            kept.append(var)
+    for n, first, last in unavailable:
+        days = range(max(first, 0), min(last + 1, builder.num_days))
+        for var in shifts.literals(n, days, builder.shift_list):
+            model.Add(var == 0)
+    model.Minimize(len(kept) - cp_model.LinearExpr.Sum(kept))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Repairs a roster changing as few assignments as possible.')
+    parser.add_argument('solution', help='Solution_*.csv or Solution_*.npz file to repair')
+    parser.add_argument('--cutoff', help='dd/mm/yyyy, days before it are kept as they are')
+    parser.add_argument('--unavailable', action='append', default=[],
+                        help='NAME:dd/mm/yyyy or NAME:dd/mm/yyyy-dd/mm/yyyy, can be repeated')
+    parser.add_argument('--output', help='repaired roster file (default: <solution>_repair.csv)')
+    solver_settings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    print('Code version: ' + code_version)
+    num_nurses, _, _, operators_name_list, config_rows = read_config()
+    settings = solver_settings.settings_from_args(args, config_rows)
+    start_date, pattern, roster = load_roster(args.solution, operators_name_list)
+    cutoff_day = day_of(start_date, args.cutoff) if args.cutoff else 0
+    unavailable = [parse_unavailable(text, start_date, operators_name_list) for text in args.unavailable]
+
+    # the hints and the pinned days name operators, keep the model unbroken
+    demand = read_demand(pattern, start_date, len(roster) // 7)
+    builder = RosterModelBuilder(pattern, num_nurses, len(roster) // 7, break_symmetry=False, demand=demand)
+    model, shifts = builder.build()
+    add_repair(builder, model, shifts, roster, cutoff_day, unavailable)
+
+    solver = cp_model.CpSolver()
+    settings.apply(solver)
+    status = solver.Solve(model)
+    print()
+    print('Statistics')
+    print('  - status          : %s' % solver.StatusName(status))
+    print('  - wall time       : %f s' % solver.WallTime())
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        index = shifts.index()
+        repaired = roster_from_solution(solver.ResponseProto().solution, index)
+        output = args.output or args.solution[:-len('.csv')] + '_repair.csv'
+        writer = SolutionWriter(start_date, builder.num_days, pattern.shift_names, operators_name_list)
+        writer.write(output, repaired)
+        writer.close()
+        print('  - changed         : %i' % solver.ObjectiveValue())
+        print_violations(repaired, builder, start_date, operators_name_list)
+        print('  - written to      : %s' % output)
+    return status
+
+
+if __name__ == '__main__':
+    main()
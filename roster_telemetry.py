@@ -0,0 +1,96 @@
+from ortools.sat import cp_model_pb2
+from ortools.sat.python import cp_model
+from contextlib import contextmanager
+import csv
+import json
+import time
+
+
+class Telemetry(object):
+    """Records where the time of a run goes.
+
+    Every record is a dict with an 'event' key:
+      phase: a timed step of the run (config, build, solve, ...), with its
+        start and duration in seconds from the creation of the Telemetry;
+      solution: an improving or intermediate solution, with the solver wall
+        time, objective, best bound, gap, conflicts and branches so far;
+      summary: the final status and statistics of a solve.
+    write() saves them as JSON lines, or as csv if the file name ends in
+    .csv.
+    """
+
+    def __init__(self, **run_info):
+        self._t0 = time.perf_counter()
+        self.run_info = run_info
+        self.records = []
+
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def record(self, event, **fields):
+        self.records.append(dict(fields, event=event, time=self.elapsed()))
+
+    @contextmanager
+    def phase(self, name):
+        start = self.elapsed()
+        try:
+            yield
+        finally:
+            self.records.append({'event': 'phase', 'name': name, 'start': start, 'duration': self.elapsed() - start})
+
+    def solution(self, callback):
+        """Records the current solution of a CpSolverSolutionCallback."""
+        objective = callback.ObjectiveValue()
+        bound = callback.BestObjectiveBound()
+        self.record('solution', wall_time=callback.WallTime(), objective=objective, best_bound=bound,
+                    gap=gap(objective, bound), conflicts=callback.NumConflicts(), branches=callback.NumBranches())
+
+    def summary(self, response, status, **info):
+        """Records the final statistics of a CpSolverResponse."""
+        fields = {'status': cp_model_pb2.CpSolverStatus.Name(status), 'wall_time': response.wall_time,
+                  'conflicts': response.num_conflicts, 'branches': response.num_branches}
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            fields['objective'] = response.objective_value
+            fields['best_bound'] = response.best_objective_bound
+            fields['gap'] = gap(fields['objective'], fields['best_bound'])
+        fields.update(info)
+        self.record('summary', **fields)
+
+    def write(self, filename):
+        records = [dict(self.run_info, **record) for record in self.records]
+        if filename.endswith('.csv'):
+            fieldnames = []
+            for record in records:
+                fieldnames.extend(key for key in record if key not in fieldnames)
+            with open(filename, 'w', newline='') as output:
+                writer = csv.DictWriter(output, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(records)
+        else:
+            with open(filename, 'w') as output:
+                for record in records:
+                    output.write(json.dumps(record) + '\n')
+
+
+def gap(objective, bound):
+    """Relative gap between an objective and its best bound."""
+    return abs(objective - bound) / max(1.0, abs(objective))
+
+
+class TelemetrySolutionPrinter(cp_model.CpSolverSolutionCallback):
+    """Prints and records the objective of every solution, like
+    cp_model.ObjectiveSolutionPrinter."""
+
+    def __init__(self, telemetry):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self._telemetry = telemetry
+        self._solution_count = 0
+
+    def on_solution_callback(self):
+        self._telemetry.solution(self)
+        print('Solution %i, time = %0.2f s, objective = %i' % (self._solution_count, self.WallTime(),
+                                                               self.ObjectiveValue()))
+        self._solution_count += 1
+
+    def solution_count(self):
+        return self._solution_count
@@ -0,0 +1,104 @@
+from ortools.sat.python import cp_model
+
+# Cost of a transition that cannot happen.
+FORBIDDEN = None
+
+
+class TransitionMatrix(object):
+    """Rules on the sequence of the daily labels of one operator.
+
+    A label is the shift worked on a day, or the rest label. costs[a][b] is
+    the cost of label a on a day followed by label b on the next one, or
+    FORBIDDEN. With min_gap, a label other than rest_label must be followed
+    by at least min_gap days of rest_label.
+
+    add() compiles the rules into one automaton per operator, whatever the
+    number of forbidden pairs, and the costs into one table constraint per
+    day.
+    """
+
+    def __init__(self, costs, rest_label=None, min_gap=0):
+        self.costs = [list(row) for row in costs]
+        self.num_labels = len(self.costs)
+        if any(len(row) != self.num_labels for row in self.costs):
+            raise ValueError('The transition matrix must be square')
+        if min_gap and rest_label is None:
+            raise ValueError('min_gap needs a rest_label')
+        self.rest_label = rest_label
+        self.min_gap = min_gap
+
+    @classmethod
+    def from_pairs(cls, num_labels, pairs, rest_label=None, min_gap=0):
+        """Builds the matrix from (previous, next, cost) triples, cost 0
+        meaning forbidden like the penalized_transitions of
+        shift_scheduling_sat.py; the other transitions cost nothing."""
+        costs = [[0] * num_labels for _ in range(num_labels)]
+        for previous, following, cost in pairs:
+            costs[previous][following] = FORBIDDEN if cost == 0 else cost
+        return cls(costs, rest_label, min_gap)
+
+    def has_costs(self):
+        return any(cost for row in self.costs for cost in row if cost is not FORBIDDEN)
+
+    def automaton(self):
+        """Returns (starting state, final states, transition triples) for
+        AddAutomaton.
+
+        A state is the label of the previous day and the days of rest since
+        the last other label, capped at min_gap; only the states reachable
+        from the start are numbered.
+        """
+        start = (None, self.min_gap)
+        states = {start: 0}
+        transitions = []
+        queue = [start]
+        while queue:
+            state = queue.pop()
+            previous, rested = state
+            for label in range(self.num_labels):
+                if previous is not None and self.costs[previous][label] is FORBIDDEN:
+                    continue
+                if label == self.rest_label:
+                    following = (label, min(rested + 1, self.min_gap))
+                elif rested < self.min_gap:
+                    continue
+                else:
+                    following = (label, 0)
+                if following not in states:
+                    states[following] = len(states)
+                    queue.append(following)
+                transitions.append((states[state], label, states[following]))
+        return 0, list(states.values()), transitions
+
+    def add(self, model, labels, prefix=''):
+        """Constrains the label variables of consecutive days of one operator.
+
+        Returns a tuple (variables_list, coefficient_list) with the total
+        transition cost of the operator, empty if no transition has a cost.
+        """
+        model.AddAutomaton(labels, *self.automaton())
+        if not self.has_costs():
+            return [], []
+        max_cost = max(cost for row in self.costs for cost in row if cost is not FORBIDDEN)
+        table = [(a, b, cost) for a, row in enumerate(self.costs) for b, cost in enumerate(row)
+                 if cost is not FORBIDDEN]
+        day_costs = []
+        for d in range(len(labels) - 1):
+            day_cost = model.NewIntVar(0, max_cost, '')
+            model.AddAllowedAssignments([labels[d], labels[d + 1], day_cost], table)
+            day_costs.append(day_cost)
+        total = model.NewIntVar(0, max_cost * len(day_costs), prefix)
+        model.Add(total == cp_model.LinearExpr.Sum(day_costs))
+        return [total], [1]
+
+
+def add_labels(model, day_literals, first_label=0):
+    """Creates one label variable per day, the first_label + i of the i-th
+    true literal of the day, or 0 if none is; at most one literal per day can
+    be true."""
+    labels = []
+    for literals in day_literals:
+        label = model.NewIntVar(0, first_label + len(literals) - 1, '')
+        model.Add(label == sum((first_label + i) * literal for i, literal in enumerate(literals)))
+        labels.append(label)
+    return labels
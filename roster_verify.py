@@ -0,0 +1,140 @@
+import argparse
+from collections import namedtuple
+from datetime import datetime, timedelta
+import sys
+import numpy as np
+
+# A broken rule: the rule name, the operator index (-1 for a shift nobody
+# works), the day indices and a description.
+Violation = namedtuple('Violation', ['rule', 'operator', 'days', 'detail'])
+
+
+def window_sums(counts, window):
+    """Sums of every window of consecutive columns of a 2D count array."""
+    cumulative = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.int32)
+    np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+    return cumulative[:, window:] - cumulative[:, :-window]
+
+
+def verify_roster(roster, builder):
+    """Checks a (day, shift) roster of operator indices against the rules of
+    a RosterModelBuilder without solving anything.
+
+    Returns the list of Violations: uncovered shifts and shifts without
+    demand, more than one shift a day, restricted shifts of restricted
+    operators, the total, sunday, prima and seconda bounds, the weekly cap,
+    the rest days after a shift and the consecutive sundays and saturdays.
+    """
+    pattern = builder.pattern
+    roster = np.asarray(roster)
+    if roster.shape != builder.demand.shape:
+        raise ValueError('The roster is %s, not %s' % (roster.shape, builder.demand.shape))
+    num_nurses = builder.num_nurses
+    regular = np.zeros(num_nurses, dtype=bool)
+    regular[builder.regular_nurses] = True
+    # worked[n, d, s]: n works shift s of day d
+    worked = roster[np.newaxis] == np.arange(num_nurses)[:, np.newaxis, np.newaxis]
+    per_day = worked.sum(axis=2)
+    violations = []
+
+    for d, s in np.argwhere((roster < 0) & (builder.demand > 0)).tolist():
+        violations.append(Violation('coverage', -1, [d], '%s not covered' % pattern.shift_names[s]))
+    for d, s in np.argwhere((roster >= 0) & (builder.demand == 0)).tolist():
+        violations.append(Violation('coverage', int(roster[d, s]), [d], '%s has no demand' % pattern.shift_names[s]))
+    unknown = (roster >= num_nurses) | (roster < -1)
+    for d, s in np.argwhere(unknown).tolist():
+        violations.append(Violation('coverage', -1, [d], 'unknown operator %i' % roster[d, s]))
+    for n, d in np.argwhere(per_day > 1).tolist():
+        violations.append(Violation('one shift per day', n, [d], '%i shifts' % per_day[n, d]))
+    if builder.restricted:
+        restricted = worked[builder.restricted][:, :, pattern.restricted_shifts]
+        for i, d, s in np.argwhere(restricted).tolist():
+            violations.append(Violation('restricted shifts', builder.restricted[i], [d],
+                                        pattern.shift_names[pattern.restricted_shifts[s]]))
+
+    # bounds on the counts of each kind
+    kinds = {'total': worked.sum(axis=(1, 2)), 'sunday': per_day[:, builder.sundays].sum(axis=1)}
+    if pattern.prima_shifts:
+        kinds['prima'] = worked[:, :, pattern.prima_shifts].sum(axis=(1, 2))
+        kinds['seconda'] = worked[:, :, pattern.seconda_shifts].sum(axis=(1, 2))
+    for kind, counts in kinds.items():
+        checked = regular if kind != 'sunday' else np.ones(num_nurses, dtype=bool)
+        bounds = [builder.count_bounds(n, kind) for n in range(num_nurses)]
+        lower = np.array([-1 if b[0] is None else b[0] for b in bounds])
+        upper = np.array([counts.max() if b[1] is None else b[1] for b in bounds])
+        for n in np.flatnonzero(checked & ((counts < lower) | (counts > upper))).tolist():
+            violations.append(Violation('%s shifts' % kind, n, [], '%i shifts, bounds %s..%s' % (
+                counts[n], bounds[n][0], bounds[n][1])))
+
+    # weekly cap
+    per_week = per_day.reshape(num_nurses, builder.num_weeks, 7).sum(axis=2)
+    cap = builder.max_shifts_per_nurse_per_week
+    for n, w in np.argwhere(regular[:, np.newaxis] & (per_week > cap)).tolist():
+        days = (w * 7 + np.flatnonzero(per_day[n, w * 7:(w + 1) * 7])).tolist()
+        violations.append(Violation('weekly cap', n, days, '%i shifts, at most %i' % (per_week[n, w], cap)))
+
+    # at most one shift in every window of 4 days, sundays and saturdays
+    windows = [('rest days', regular, builder.days, per_day),
+               ('consecutive sundays', None, builder.sundays, per_day[:, builder.sundays]),
+               ('consecutive saturdays', None, builder.saturdays,
+                worked[:, builder.saturdays][:, :, pattern.saturday_shifts].sum(axis=2))]
+    for rule, checked, days, counts in windows:
+        if counts.shape[1] < 4:
+            continue
+        crowded = window_sums(counts, 4) > 1
+        if checked is not None:
+            crowded &= checked[:, np.newaxis]
+        # report a run of overlapping crowded windows once
+        crowded[:, 1:] &= ~crowded[:, :-1]
+        for n, i in np.argwhere(crowded).tolist():
+            window = [days[i + k] for k in range(4) if counts[n, i + k]]
+            violations.append(Violation(rule, n, window, 'at most one shift in 4 %s' % (
+                'days' if rule == 'rest days' else rule.split()[1])))
+    return violations
+
+
+def format_violation(violation, start_date, operators_name_list):
+    start = datetime.strptime(start_date, '%d/%m/%Y')
+    name = operators_name_list[violation.operator] if violation.operator >= 0 else '-'
+    dates = ', '.join((start + timedelta(days=d)).strftime('%d/%m/%Y') for d in violation.days)
+    return '%s: %s%s: %s' % (violation.rule, name, ' on ' + dates if dates else '', violation.detail)
+
+
+def print_violations(roster, builder, start_date, operators_name_list):
+    """Prints the statistics line and the violations of a solved roster."""
+    violations = verify_roster(roster, builder)
+    print('  - violations      : %i' % len(violations))
+    for violation in violations:
+        print('      ' + format_violation(violation, start_date, operators_name_list))
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Checks Solution_*.csv or .npz rosters against the roster rules.')
+    parser.add_argument('solutions', nargs='+', help='Solution_*.csv or Solution_*.npz files')
+    args = parser.parse_args(argv)
+
+    from roster_model import RosterModelBuilder, read_config, read_demand
+    from roster_repair import load_roster
+    num_nurses, _, _, operators_name_list, _ = read_config()
+    failed = 0
+    for filename in args.solutions:
+        try:
+            start_date, pattern, roster = load_roster(filename, operators_name_list)
+        except (ValueError, OSError) as e:
+            print('%s: %s' % (filename, e))
+            failed += 1
+            continue
+        num_weeks = len(roster) // 7
+        builder = RosterModelBuilder(pattern, num_nurses, num_weeks,
+                                     demand=read_demand(pattern, start_date, num_weeks))
+        violations = verify_roster(roster, builder)
+        print('%s: %s' % (filename, '%i violations' % len(violations) if violations else 'valid'))
+        for violation in violations:
+            print('  - ' + format_violation(violation, start_date, operators_name_list))
+        failed += bool(violations)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
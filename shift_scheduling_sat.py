@@ -16,15 +16,31 @@
 from absl import app
 from absl import flags
 
+import numpy as np
 from ortools.sat.python import cp_model
 from google.protobuf import text_format
 
+from roster_telemetry import Telemetry
+from roster_telemetry import TelemetrySolutionPrinter
+from roster_transitions import TransitionMatrix
+from roster_transitions import add_labels
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_string('output_proto', '',
                     'Output file to write the cp_model proto to.')
 flags.DEFINE_string('params', 'max_time_in_seconds:10.0',
                     'Sat solver parameters.')
+flags.DEFINE_enum('sequence_encoding', 'spans', ['spans', 'counter'],
+                  'Encoding of the shift sequence constraints: one clause '
+                  'per span, or run length automata and one penalty per '
+                  'day beyond soft_max.')
+flags.DEFINE_string('cover_demands', '',
+                    'Spreadsheet (.xlsx, first sheet) or .csv file with the '
+                    'cover demands, see read_cover_demands.')
+flags.DEFINE_string('telemetry', '',
+                    'Output file (.jsonl or .csv) for the build timings and '
+                    'the time series of the solutions.')
 
 
 def negated_bounded_span(works, start, length):
@@ -127,6 +143,99 @@ def add_soft_sequence_constraint(model, works, hard_min, soft_min, min_cost,
     return cost_literals, cost_coefficients
 
 
+def add_soft_sequence_counter(model, works, hard_min, soft_min, min_cost,
+                              soft_max, hard_max, max_cost, prefix):
+    """Sequence constraint on true variables, encoded with run lengths.
+
+  Same constraint and same penalties as add_soft_sequence_constraint, with
+  fewer constraints. A sequence without penalties is one automaton whose
+  state is the length of the current run of true variables, capped at
+  hard_max, instead of one clause per forbidden span. A penalized sequence
+  keeps the clauses of its hard bounds, which the linear relaxation of its
+  penalty literals relies on, and pays its excess one literal per day beyond
+  soft_max, so a sequence of length l pays max_cost * (l - soft_max) with
+  one literal per day instead of one per (start, length) span.
+
+  Args:
+    model: the sequence constraint is built on this model.
+    works: a list of Boolean variables.
+    hard_min: any sequence of true variables must have a length of at least
+      hard_min.
+    soft_min: any sequence should have a length of at least soft_min, or a
+      linear penalty on the delta will be added to the objective.
+    min_cost: the coefficient of the linear penalty if the length is less than
+      soft_min.
+    soft_max: any sequence should have a length of at most soft_max, or a linear
+      penalty on the delta will be added to the objective.
+    hard_max: any sequence of true variables must have a length of at most
+      hard_max.
+    max_cost: the coefficient of the linear penalty if the length is more than
+      soft_max.
+    prefix: a base name for penalty literals.
+
+  Returns:
+    a tuple (variables_list, coefficient_list) containing the different
+    penalties created by the sequence constraint.
+  """
+    penalize_under = min_cost > 0 and soft_min > hard_min
+    penalize_over = max_cost > 0 and soft_max < hard_max
+    if not penalize_under and not penalize_over:
+        # State r is a run of r true variables up to the last one read.
+        transitions = []
+        for run in range(hard_max + 1):
+            if run < hard_max:
+                transitions.append((run, 1, run + 1))
+            if run == 0 or run >= hard_min:
+                transitions.append((run, 0, 0))
+        final_states = [
+            run for run in range(hard_max + 1) if run == 0 or run >= hard_min
+        ]
+        model.AddAutomaton(works, 0, final_states, transitions)
+        return [], []
+
+    cost_literals = []
+    cost_coefficients = []
+
+    # Forbid sequences that are too short.
+    for length in range(1, hard_min):
+        for start in range(len(works) - length + 1):
+            model.AddBoolOr(negated_bounded_span(works, start, length))
+
+    # Penalize sequences that are below the soft limit.
+    if penalize_under:
+        for length in range(hard_min, soft_min):
+            for start in range(len(works) - length + 1):
+                span = negated_bounded_span(works, start, length)
+                name = ': under_span(start=%i, length=%i)' % (start, length)
+                lit = model.NewBoolVar(prefix + name)
+                span.append(lit)
+                model.AddBoolOr(span)
+                cost_literals.append(lit)
+                cost_coefficients.append(min_cost * (soft_min - length))
+
+    # Penalize each day beyond soft_max: the soft_max + 1 days ending on it
+    # are all true.
+    if penalize_over:
+        for day in range(soft_max, len(works)):
+            lit = model.NewBoolVar(prefix + ': over_run(day=%i)' % day)
+            window = [works[i].Not() for i in range(day - soft_max, day + 1)]
+            model.AddBoolOr(window + [lit])
+            cost_literals.append(lit)
+            cost_coefficients.append(max_cost)
+
+    # Just forbid any sequence of true variables with length hard_max + 1
+    for start in range(len(works) - hard_max):
+        model.AddBoolOr(
+            [works[i].Not() for i in range(start, start + hard_max + 1)])
+    return cost_literals, cost_coefficients
+
+
+SEQUENCE_ENCODINGS = {
+    'spans': add_soft_sequence_constraint,
+    'counter': add_soft_sequence_counter,
+}
+
+
 def add_soft_sum_constraint(model, works, hard_min, soft_min, min_cost,
                             soft_max, hard_max, max_cost, prefix):
     """Sum constraint with soft and hard bounds.
@@ -184,12 +293,78 @@ def add_soft_sum_constraint(model, works, hard_min, soft_min, min_cost,
     return cost_variables, cost_coefficients
 
 
-def solve_shift_scheduling(params, output_proto):
-    """Solves the shift scheduling problem."""
+SHIFTS = ['O', 'M', 'A', 'N']
+
+# Daily demands for work shifts (morning, afternon, night) for each day of the
+# week starting on Monday.
+WEEKLY_COVER_DEMANDS = np.array([
+    (2, 3, 1),  # Monday
+    (2, 3, 1),  # Tuesday
+    (2, 2, 2),  # Wednesday
+    (2, 3, 1),  # Thursday
+    (2, 2, 2),  # Friday
+    (1, 2, 3),  # Saturday
+    (1, 3, 1),  # Sunday
+])
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+             'Saturday', 'Sunday']
+
+
+def read_cover_demands(filename, num_weeks):
+    """Reads the (day, work shift) cover demands of num_weeks weeks.
+
+  The sheet has a 'day' column and one column per work shift (M, A, N). A row
+  whose day is a week day name replaces the demand of that day in every week,
+  a row whose day is a day number overrides that day only, e.g. a holiday.
+  Days missing from the sheet keep WEEKLY_COVER_DEMANDS.
+
+  Args:
+    filename: a .csv file, or a spreadsheet whose first sheet is read.
+    num_weeks: number of weeks of the schedule.
+
+  Returns:
+    a (num_weeks * 7, 3) int array.
+  """
+    import pandas as pd
+    if filename.endswith('.csv'):
+        frame = pd.read_csv(filename)
+    else:
+        frame = pd.read_excel(filename)
+    weekly = WEEKLY_COVER_DEMANDS.copy()
+    overrides = []
+    rows = frame[SHIFTS[1:]].fillna(0).astype(int).values
+    for day, row in zip(frame['day'], rows):
+        day = str(day).strip()
+        if day.capitalize() in DAY_NAMES:
+            weekly[DAY_NAMES.index(day.capitalize())] = row
+        else:
+            overrides.append((int(day), row))
+    demands = np.tile(weekly, (num_weeks, 1))
+    for day, row in overrides:
+        demands[day] = row
+    return demands
+
+
+def create_shift_scheduling_model(num_employees=8, num_weeks=3,
+                                  sequence_encoding='spans', cover_demands=None):
+    """Creates the shift scheduling model.
+
+  Args:
+    num_employees: number of employees, at least 8.
+    num_weeks: number of weeks of the schedule.
+    sequence_encoding: one of SEQUENCE_ENCODINGS, the encoding of the shift
+      constraints on continuous sequences.
+    cover_demands: (day, work shift) array of the minimum number of employees
+      on each shift, WEEKLY_COVER_DEMANDS every week by default.
+
+  Returns:
+    a tuple (model, work, obj_bool_vars, obj_bool_coeffs, obj_int_vars,
+    obj_int_coeffs) with the model, the work[e, s, d] variables and the
+    linear terms of the objective.
+  """
     # Data
-    num_employees = 8
-    num_weeks = 3
-    shifts = ['O', 'M', 'A', 'N']
+    shifts = SHIFTS
 
     # Fixed assignment: (employee, shift, day).
     # This fixes the first 2 days of the schedule.
@@ -253,23 +428,17 @@ def solve_shift_scheduling(params, output_proto):
         (3, 1, 0),
     ]
 
-    # daily demands for work shifts (morning, afternon, night) for each day
-    # of the week starting on Monday.
-    weekly_cover_demands = [
-        (2, 3, 1),  # Monday
-        (2, 3, 1),  # Tuesday
-        (2, 2, 2),  # Wednesday
-        (2, 3, 1),  # Thursday
-        (2, 2, 2),  # Friday
-        (1, 2, 3),  # Saturday
-        (1, 3, 1),  # Sunday
-    ]
-
     # Penalty for exceeding the cover constraint per shift type.
     excess_cover_penalties = (2, 2, 5)
 
     num_days = num_weeks * 7
     num_shifts = len(shifts)
+    if cover_demands is None:
+        cover_demands = np.tile(WEEKLY_COVER_DEMANDS, (num_weeks, 1))
+    if np.shape(cover_demands) != (num_days, num_shifts - 1):
+        raise ValueError('cover_demands must be (%i days, %i shifts), not %s' %
+                         (num_days, num_shifts - 1, np.shape(cover_demands)))
+    add_sequence_constraint = SEQUENCE_ENCODINGS[sequence_encoding]
 
     model = cp_model.CpModel()
 
@@ -304,7 +473,7 @@ def solve_shift_scheduling(params, output_proto):
         shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
         for e in range(num_employees):
             works = [work[e, shift, d] for d in range(num_days)]
-            variables, coeffs = add_soft_sequence_constraint(
+            variables, coeffs = add_sequence_constraint(
                 model, works, hard_min, soft_min, min_cost, soft_max, hard_max,
                 max_cost,
                 'shift_constraint(employee %i, shift %i)' % (e, shift))
@@ -326,41 +495,30 @@ def solve_shift_scheduling(params, output_proto):
                 obj_int_coeffs.extend(coeffs)
 
     # Penalized transitions
-    for previous_shift, next_shift, cost in penalized_transitions:
-        for e in range(num_employees):
-            for d in range(num_days - 1):
-                transition = [
-                    work[e, previous_shift, d].Not(), work[e, next_shift,
-                                                           d + 1].Not()
-                ]
-                if cost == 0:
-                    model.AddBoolOr(transition)
-                else:
-                    trans_var = model.NewBoolVar(
-                        'transition (employee=%i, day=%i)' % (e, d))
-                    transition.append(trans_var)
-                    model.AddBoolOr(transition)
-                    obj_bool_vars.append(trans_var)
-                    obj_bool_coeffs.append(cost)
-
-    # Cover constraints
-    for s in range(1, num_shifts):
-        for w in range(num_weeks):
-            for d in range(7):
-                works = [work[e, s, w * 7 + d] for e in range(num_employees)]
-                # Ignore Off shift.
-                min_demand = weekly_cover_demands[d][s - 1]
-                worked = model.NewIntVar(min_demand, num_employees, '')
-                model.Add(worked == sum(works))
-                over_penalty = excess_cover_penalties[s - 1]
-                if over_penalty > 0:
-                    name = 'excess_demand(shift=%i, week=%i, day=%i)' % (s, w,
-                                                                         d)
-                    excess = model.NewIntVar(0, num_employees - min_demand,
-                                             name)
-                    model.Add(excess == worked - min_demand)
-                    obj_int_vars.append(excess)
-                    obj_int_coeffs.append(over_penalty)
+    transitions = TransitionMatrix.from_pairs(num_shifts, penalized_transitions)
+    for e in range(num_employees):
+        labels = add_labels(
+            model, [[work[e, s, d] for s in range(num_shifts)]
+                    for d in range(num_days)])
+        variables, coeffs = transitions.add(
+            model, labels, 'transitions(employee=%i)' % e)
+        obj_int_vars.extend(variables)
+        obj_int_coeffs.extend(coeffs)
+
+    # Cover constraints, the Off shift is not covered.
+    for (d, s), min_demand in np.ndenumerate(cover_demands):
+        min_demand = int(min_demand)
+        works = [work[e, s + 1, d] for e in range(num_employees)]
+        worked = model.NewIntVar(min_demand, num_employees, '')
+        model.Add(worked == sum(works))
+        over_penalty = excess_cover_penalties[s]
+        if over_penalty > 0:
+            name = 'excess_demand(shift=%i, week=%i, day=%i)' % (s + 1, d // 7,
+                                                                 d % 7)
+            excess = model.NewIntVar(0, num_employees - min_demand, name)
+            model.Add(excess == worked - min_demand)
+            obj_int_vars.append(excess)
+            obj_int_coeffs.append(over_penalty)
 
     # Objective
     model.Minimize(
@@ -369,6 +527,27 @@ def solve_shift_scheduling(params, output_proto):
         sum(obj_int_vars[i] * obj_int_coeffs[i]
             for i in range(len(obj_int_vars))))
 
+    return model, work, obj_bool_vars, obj_bool_coeffs, obj_int_vars, obj_int_coeffs
+
+
+def solve_shift_scheduling(params, output_proto, telemetry_file='',
+                           sequence_encoding='spans', cover_demands=None):
+    """Solves the shift scheduling problem."""
+    num_employees = 8
+    num_weeks = 3
+    shifts = SHIFTS
+    num_days = num_weeks * 7
+    num_shifts = len(shifts)
+    telemetry = Telemetry(num_employees=num_employees, num_weeks=num_weeks,
+                          sequence_encoding=sequence_encoding)
+    with telemetry.phase('build'):
+        (model, work, obj_bool_vars, obj_bool_coeffs, obj_int_vars,
+         obj_int_coeffs) = create_shift_scheduling_model(num_employees, num_weeks,
+                                                         sequence_encoding,
+                                                         cover_demands)
+    telemetry.record('model', variables=len(model.Proto().variables),
+                     constraints=len(model.Proto().constraints))
+
     if output_proto:
         print('Writing proto to %s' % output_proto)
         with open(output_proto, 'w') as text_file:
@@ -378,8 +557,12 @@ def solve_shift_scheduling(params, output_proto):
     solver = cp_model.CpSolver()
     if params:
         text_format.Parse(params, solver.parameters)
-    solution_printer = cp_model.ObjectiveSolutionPrinter()
-    status = solver.Solve(model, solution_printer)
+    solution_printer = TelemetrySolutionPrinter(telemetry)
+    with telemetry.phase('solve'):
+        status = solver.Solve(model, solution_printer)
+    telemetry.summary(solver.ResponseProto(), status)
+    if telemetry_file:
+        telemetry.write(telemetry_file)
 
     # Print solution.
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
@@ -419,7 +602,11 @@ def solve_shift_scheduling(params, output_proto):
 
 
 def main(_):
-    solve_shift_scheduling(FLAGS.params, FLAGS.output_proto)
+    cover_demands = None
+    if FLAGS.cover_demands:
+        cover_demands = read_cover_demands(FLAGS.cover_demands, 3)
+    solve_shift_scheduling(FLAGS.params, FLAGS.output_proto, FLAGS.telemetry,
+                           FLAGS.sequence_encoding, cover_demands)
 
 
 if __name__ == '__main__':
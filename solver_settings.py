@@ -0,0 +1,139 @@
+from ortools.sat.python import cp_model
+import multiprocessing
+import os
+
+# Search strategy presets, applied on top of the solver defaults.
+PRESETS = {
+    'default': {'linearization_level': 0},
+    'linear': {'linearization_level': 2},
+    'first': {'linearization_level': 0, 'stop_after_first_solution': True},
+    'no_presolve': {'linearization_level': 0, 'cp_model_presolve': False},
+}
+
+# Rows of the 'Parametri' sheet of TurniConfig.xlsx read by from_config().
+CONFIG_WORKERS = 'NUM WORKERS'
+CONFIG_TIME_LIMIT = 'TEMPO MASSIMO (s)'
+CONFIG_SEEDS = 'SEMI (lista divisa da virgola)'
+CONFIG_PRESET = 'STRATEGIA'
+CONFIG_PORTFOLIO = 'PORTFOLIO'
+
+
+class SolverSettings(object):
+    """CP-SAT settings of a roster solve.
+
+    num_workers: search workers, defaults to the number of cores.
+    time_limit: time budget in seconds, None for no limit.
+    seeds: random seeds; a single solve uses the first one.
+    preset: name of one of the PRESETS.
+    portfolio: number of differently seeded solves run in a process pool,
+      0 to solve once in this process.
+    keep: 'first' stops the portfolio at the first solution found, 'best'
+      waits for every solve and keeps the best objective.
+    """
+
+    def __init__(self, num_workers=None, time_limit=None, seeds=None, preset='default', portfolio=0, keep='first'):
+        if preset not in PRESETS:
+            raise ValueError('Unknown preset %s, use one of %s' % (preset, ', '.join(sorted(PRESETS))))
+        if keep not in ('first', 'best'):
+            raise ValueError('keep must be first or best, not %s' % keep)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.seeds = list(seeds) if seeds else list(range(max(1, portfolio)))
+        self.preset = preset
+        self.portfolio = portfolio
+        self.keep = keep
+
+    def apply(self, solver, seed=None, num_workers=None):
+        """Sets the parameters of a CpSolver."""
+        for name, value in PRESETS[self.preset].items():
+            setattr(solver.parameters, name, value)
+        solver.parameters.num_search_workers = num_workers or self.num_workers
+        solver.parameters.random_seed = self.seeds[0] if seed is None else seed
+        if self.time_limit:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        return solver
+
+    def portfolio_seeds(self):
+        seeds = list(self.seeds)
+        while len(seeds) < self.portfolio:
+            seeds.append(max(seeds) + 1)
+        return seeds[:self.portfolio]
+
+    @classmethod
+    def from_config(cls, rows, **kwargs):
+        """Builds the settings from the {PARAMETRO: VALORE} rows of the config
+        sheet; missing rows keep the defaults, kwargs override both."""
+        settings = {}
+        if rows.get(CONFIG_WORKERS):
+            settings['num_workers'] = int(rows[CONFIG_WORKERS])
+        if rows.get(CONFIG_TIME_LIMIT):
+            settings['time_limit'] = float(rows[CONFIG_TIME_LIMIT])
+        if rows.get(CONFIG_SEEDS) not in (None, ''):
+            settings['seeds'] = [int(seed) for seed in str(rows[CONFIG_SEEDS]).split(',')]
+        if rows.get(CONFIG_PRESET):
+            settings['preset'] = str(rows[CONFIG_PRESET]).strip()
+        if rows.get(CONFIG_PORTFOLIO):
+            settings['portfolio'] = int(rows[CONFIG_PORTFOLIO])
+        settings.update((k, v) for k, v in kwargs.items() if v is not None)
+        return cls(**settings)
+
+
+def add_arguments(parser):
+    """Adds the solver settings options to an argparse parser."""
+    group = parser.add_argument_group('solver')
+    group.add_argument('--workers', type=int, help='search workers (default: number of cores)')
+    group.add_argument('--time_limit', type=float, help='time budget in seconds')
+    group.add_argument('--seeds', type=int, nargs='+', help='random seeds')
+    group.add_argument('--preset', choices=sorted(PRESETS), help='search strategy preset')
+    group.add_argument('--portfolio', type=int, help='number of seeded solves run in parallel processes')
+    group.add_argument('--keep', choices=['first', 'best'], help='portfolio result to keep')
+    return parser
+
+
+def settings_from_args(args, config_rows=None):
+    return SolverSettings.from_config(config_rows or {}, num_workers=args.workers, time_limit=args.time_limit,
+                                      seeds=args.seeds, preset=args.preset, portfolio=args.portfolio,
+                                      keep=args.keep)
+
+
+def _solve_seed(task):
+    model_bytes, settings, seed, num_workers = task
+    model = cp_model.CpModel()
+    model.Proto().ParseFromString(model_bytes)
+    solver = cp_model.CpSolver()
+    settings.apply(solver, seed=seed, num_workers=num_workers)
+    status = solver.Solve(model)
+    response = solver.ResponseProto()
+    return {'seed': seed, 'status': status, 'status_name': solver.StatusName(status),
+            'objective': response.objective_value, 'wall_time': solver.WallTime(),
+            'conflicts': solver.NumConflicts(), 'branches': solver.NumBranches(),
+            'solution': list(response.solution)}
+
+
+def solve_portfolio(model, settings):
+    """Solves the model once per portfolio seed across a process pool.
+
+    The search workers are split between the processes. Returns the kept
+    result, a dict with seed, status, objective, statistics and the solution
+    values indexed like the model variables, or None if no solve found a
+    solution.
+    """
+    seeds = settings.portfolio_seeds()
+    num_workers = max(1, settings.num_workers // len(seeds))
+    model_bytes = model.Proto().SerializeToString()
+    tasks = [(model_bytes, settings, seed, num_workers) for seed in seeds]
+    sign = -1 if model.Proto().objective.scaling_factor < 0 else 1
+    best = None
+    pool = multiprocessing.Pool(len(seeds))
+    try:
+        for result in pool.imap_unordered(_solve_seed, tasks):
+            if result['status'] not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                continue
+            if settings.keep == 'first':
+                return result
+            if best is None or sign * result['objective'] < sign * best['objective']:
+                best = result
+    finally:
+        pool.terminate()
+        pool.join()
+    return best
@@ -0,0 +1,38 @@
+import time
+from ortools.sat.python import cp_model
+from roster_model import FOUR_SHIFTS, RosterModelBuilder, roster_from_solution, solve_lexicographic
+from roster_verify import verify_roster
+
+
+class SlowFirstSolution(cp_model.CpSolverSolutionCallback):
+    """Spends the time budget on the first solution, so that the next
+    solve has almost no time left."""
+
+    def __init__(self, until):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.until = until
+        self.count = 0
+
+    def on_solution_callback(self):
+        self.count += 1
+        if self.count == 1:
+            time.sleep(max(0.0, self.until - time.perf_counter()))
+
+
+def test_lexicographic_keeps_the_last_solution_found():
+    # the first solve finds a roster, the second one times out before
+    # finding any: the response of the first one is returned
+    builder = RosterModelBuilder(FOUR_SHIFTS, 22, 6, soft_fairness=True)
+    model, shifts = builder.build()
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    solver.parameters.max_time_in_seconds = 5.0
+    callback = SlowFirstSolution(time.perf_counter() + 4.99)
+    status, response = solve_lexicographic(model, [builder.fairness_objective()], solver, callback)
+    assert callback.count == 1
+    assert solver.ResponseProto().status == cp_model.UNKNOWN
+    assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    assert len(response.solution) == len(model.Proto().variables)
+    roster = roster_from_solution(response.solution, shifts.index())
+    assert verify_roster(roster, builder) == []
+    assert solver.parameters.max_time_in_seconds == 5.0
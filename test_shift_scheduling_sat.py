@@ -0,0 +1,53 @@
+from ortools.sat.python import cp_model
+import pytest
+import shift_scheduling_sat
+
+ENCODINGS = sorted(shift_scheduling_sat.SEQUENCE_ENCODINGS)
+
+
+def solve(model, time_limit=60.0):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = 8
+    status = solver.Solve(model)
+    return status, solver
+
+
+def pinned_objective(encoding, assignment):
+    model, work = shift_scheduling_sat.create_shift_scheduling_model(8, 3, encoding)[:2]
+    for key, value in assignment.items():
+        model.Add(work[key] == value)
+    status, solver = solve(model)
+    assert status == cp_model.OPTIMAL
+    return solver.ObjectiveValue()
+
+
+def test_encodings_reach_the_same_optimum():
+    # the default instance, proved optimal by both encodings
+    objectives = {}
+    for encoding in ENCODINGS:
+        model = shift_scheduling_sat.create_shift_scheduling_model(8, 3, encoding)[0]
+        status, solver = solve(model, time_limit=300.0)
+        assert status == cp_model.OPTIMAL, encoding
+        objectives[encoding] = solver.ObjectiveValue()
+    assert len(set(objectives.values())) == 1, objectives
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_encodings_give_the_same_penalties(seed):
+    # a roster of the default instance, pinned in the models of both
+    # encodings, costs the same
+    model, work = shift_scheduling_sat.create_shift_scheduling_model(8, 3, 'spans')[:2]
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    solver.parameters.random_seed = seed
+    solver.parameters.stop_after_first_solution = True
+    assert solver.Solve(model) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    assignment = dict((key, solver.Value(var)) for key, var in work.items())
+    objectives = [pinned_objective(encoding, assignment) for encoding in ENCODINGS]
+    assert len(set(objectives)) == 1, dict(zip(ENCODINGS, objectives))
+
+
+def test_unknown_encoding():
+    with pytest.raises(KeyError):
+        shift_scheduling_sat.create_shift_scheduling_model(8, 3, 'unknown')
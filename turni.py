@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Roster tools behind a single command: turni <command> [options].
+
+Each command imports what it needs when it runs, so checking the
+configuration or printing the help does not load pandas or OR-Tools.
+"""
+import argparse
+import sys
+
+COMMANDS = {
+    'solve': 'generates the roster, like main.py (--shifts 2 like main_1xS.py)',
+    'rolling': 'generates a long roster block by block',
+    'repair': 're-plans a published roster',
+    'batch': 'solves a table of scenarios in parallel, each in its own directory',
+    'validate': 'checks the configuration workbook',
+    'verify': 'checks Solution_*.csv or .npz rosters against the roster rules',
+    'bench': 'runs the model benchmarks',
+}
+
+
+def solve(argv):
+    parser = argparse.ArgumentParser(prog='turni solve', add_help=False)
+    parser.add_argument('--shifts', type=int, choices=[2, 4], default=4)
+    args, argv = parser.parse_known_args(argv)
+    import roster_model
+    pattern = roster_model.FOUR_SHIFTS if args.shifts == 4 else roster_model.TWO_SHIFTS
+    roster_model.run(pattern, argv)
+    return 0
+
+
+def rolling(argv):
+    import rolling_horizon
+    rolling_horizon.main(argv)
+    return 0
+
+
+def repair(argv):
+    import roster_repair
+    roster_repair.main(argv)
+    return 0
+
+
+def batch(argv):
+    import roster_batch
+    return roster_batch.main(argv)
+
+
+def validate(argv):
+    import roster_config
+    parser = argparse.ArgumentParser(prog='turni validate', description=COMMANDS['validate'])
+    parser.add_argument('--config', default=roster_config.CONFIG_FILE, help='workbook to check')
+    parser.add_argument('--no_cache', action='store_true', help='parse the workbook even if it did not change')
+    args = parser.parse_args(argv)
+    try:
+        config = roster_config.load_config(args.config, use_cache=not args.no_cache)
+        if args.no_cache:
+            roster_config.validate(config)
+    except (OSError, roster_config.ConfigError) as e:
+        print('%s: %s' % (args.config, e))
+        return 1
+    parameters = config['parameters']
+    print('%s is valid' % args.config)
+    print('  - start date      : %s' % parameters[roster_config.START_DATE])
+    print('  - weeks           : %i' % parameters[roster_config.NUM_WEEKS])
+    print('  - operators       : %i' % parameters[roster_config.NUM_OPERATORS])
+    print('  - demand sheets   : %s' % (', '.join(sorted(config['demand'])) or 'none, default coverage'))
+    return 0
+
+
+def verify(argv):
+    import roster_verify
+    return roster_verify.main(argv)
+
+
+def bench(argv):
+    import bench_roster
+    bench_roster.main(argv)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='turni', description='Roster tools.',
+                                     epilog='turni <command> --help describes the options of a command.')
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command',
+                        help='; '.join('%s: %s' % item for item in COMMANDS.items()))
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    return globals()[args.command](args.arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,10 +9,24 @@
 # minimizes the difference between the maximum and minimum number of
 # shifts worked among all workers.  The second optimization is allowed
 # to degrade the first objective by up to the smaller value of 10% and 2 */
+#
+# workforce_mip.py solves the same model without a Gurobi licence, on SCIP,
+# CBC or CP-SAT.
 
+import gurobipy
 from gurobipy import *
+import numpy as np
 import pandas as pd
-import random
+
+# The model is assembled with the matrix API, MVar times scipy sparse
+# matrices, of gurobipy 10 or later.
+REQUIREMENT = 'workforce_gurobipy.py needs gurobipy 10 or later and scipy: pip install "gurobipy>=10" scipy'
+try:
+    import scipy.sparse as sp
+except ImportError:
+    raise ImportError('scipy is not installed; ' + REQUIREMENT)
+if gurobipy.gurobi.version()[0] < 10:
+    raise ImportError('gurobipy %i.%i.%i is too old; %s' % (gurobipy.gurobi.version() + (REQUIREMENT,)))
 
 
 num_weeks = 6
@@ -24,7 +38,6 @@ shifts_per_week = 16
 num_nurses = 22
 #num_nurses = 16
 nurseList = list(range(num_nurses))
-random.shuffle(nurseList)
 nurseList_ = range(1, num_nurses)
 weekdaysList = range(week_days)
 infrasettimanali = [0, 1, 2, 3, 4, 5]
@@ -62,73 +75,69 @@ try:
     # Sample data
     # Sets of days and workers
     # Number of workers required for each shift
-    shiftRequirements = {(d, s): 1 for d in dayList for s in shiftList}
-
-    for w in weekList:
-        for d in infrasettimanali:
-            day = w*7 + d
-            shiftRequirements[day, 0] = 0
-            shiftRequirements[day, 1] = 0
+    shiftRequirements = np.ones((len(dayList), num_shifts), dtype=np.int16)
+    weekdays = np.array([d for d in dayList if d % 7 in infrasettimanali])
+    shiftRequirements[weekdays[:, np.newaxis], [0, 1]] = 0
 
-    # Create availability dictionary to be used in decision variable bounding
-    avail = {(n, d, s): 1 for n in nurseList for d in dayList for s in shiftList}
+    # Create availability array, only the available triples get a variable
+    avail = np.repeat((shiftRequirements > 0)[np.newaxis], num_nurses, axis=0)
     # MOLINARO
-    for w in weekList:
-        for d in dayList:
-            day = int(w * 7 + d)
-            avail[0, day, 2] = 0
-            avail[0, day, 3] = 0
-
-    for n in nurseList:
-        for w in weekList:
-            for d in infrasettimanali:
-                day = int(w * 7 + d)
-                avail[n, day, 0] = 0
-                avail[n, day, 1] = 0
+    avail[0][:, [2, 3]] = False
 
     # Create initial model
     model = Model("Turni_Infermieri_Dialisi")
 
-    # Initialize assignment decision variables:
-    x = model.addVars(nurseList, dayList, shiftList, ub=avail, vtype=GRB.BINARY, name='x')
+    # Initialize assignment decision variables: column j of the matrices is
+    # the available triple (nurse[j], day[j], shift[j])
+    nurse, day, shift = np.nonzero(avail)
+    num_vars = len(nurse)
+    x = model.addMVar(num_vars, vtype=GRB.BINARY, name='x')
+
+    def incidence(rows, num_rows, columns=None):
+        # sparse 0/1 matrix with a 1 in (rows[i], columns[i]), all the
+        # columns by default
+        if columns is None:
+            columns = np.arange(num_vars)
+        return sp.csr_matrix((np.ones(len(columns)), (rows, columns)), shape=(num_rows, num_vars))
 
-    # Variables to count the total shifts worked by each worker
-    totShifts = model.addVars(nurseList, name='TotshiftList')
     # Constraint: assign exactly shiftRequirements[s] workers
-    model.addConstrs((x.sum('*', d, s) == shiftRequirements[d, s] for d in dayList for s in shiftList),
-                     name='shiftRequirement')
+    required = np.flatnonzero(shiftRequirements.ravel())
+    coverage = incidence(day * num_shifts + shift, shiftRequirements.size)[required]
+    model.addConstr(coverage @ x == shiftRequirements.ravel()[required], name='shiftRequirement')
 
     # Max daily shifts = 1
-    model.addConstrs((x.sum(n, d, '*') <= 1 for n in nurseList for d in dayList), name='dailyshifts')
+    model.addConstr(incidence(nurse * len(dayList) + day, num_nurses * len(dayList)) @ x <= 1,
+                    name='dailyshifts')
 
+    # Variables to count the total shifts worked by each worker
+    totShifts = model.addMVar(num_nurses, name='TotshiftList')
     # Constraint: compute the total number of shifts for each worker
-    model.addConstrs((totShifts[n] == x.sum(n, '*') for n in nurseList), name='totShifts')
+    model.addConstr(incidence(nurse, num_nurses) @ x == totShifts, name='totShifts')
 
-    # balance weeks
-    for w in weekList:
-        tmpweekList = range(w*7, w*7+6)
-        name_var = 'weekVar_w{}'.format(w)
-        name_constr = 'weekConstr_w{}'.format(w)
-        model.addConstrs(((x.sum(n, tmpweekList, '*') <= 1 for n in nurseList)), name=name_constr)
+    # balance weeks, at most one shift from monday to saturday
+    weekday = np.flatnonzero(day % 7 < 6)
+    model.addConstr(incidence((nurse * num_weeks + day // 7)[weekday], num_nurses * num_weeks, weekday) @ x <= 1,
+                    name='weekConstr')
 
-    turni_di_prima = model.addVars(nurseList, dayList, [0, 2], ub=avail, vtype=GRB.BINARY, name='T_di_Prima')
-    turni_di_seconda = model.addVars(nurseList, dayList, [1, 3], ub=avail, vtype=GRB.BINARY, name='T_di_Seconda')
+    prima = np.flatnonzero(np.isin(shift, [0, 2]))
+    seconda = np.flatnonzero(np.isin(shift, [1, 3]))
+    turni_di_prima = model.addMVar(len(prima), vtype=GRB.BINARY, name='T_di_Prima')
+    turni_di_seconda = model.addMVar(len(seconda), vtype=GRB.BINARY, name='T_di_Seconda')
     # Variable to represent these shifts
     totTurnidiPrima = model.addVar(name='totTdiPrima')
     totTurnidiSeconda = model.addVar(name='totTdiSeconda')
-    model.addConstrs((totTurnidiPrima == turni_di_prima.sum(n, '*') for n in nurseList), name='CtotTdPrima')
-    model.addConstrs((totTurnidiSeconda == turni_di_seconda.sum(n, '*') for n in nurseList), name='CtotTdSeconda')
+    ones = np.ones(num_nurses)
+    primaCount = incidence(nurse[prima], num_nurses, prima)[:, prima]
+    secondaCount = incidence(nurse[seconda], num_nurses, seconda)[:, seconda]
+    model.addConstr(primaCount @ turni_di_prima == totTurnidiPrima * ones, name='CtotTdPrima')
+    model.addConstr(secondaCount @ turni_di_seconda == totTurnidiSeconda * ones, name='CtotTdSeconda')
 
     # Turni del weekend
     # balance weekends
-    tmpSundayList = []
-    for w in weekList:
-        # tmpSundayList.append(w * 7 + 5)
-        tmpSundayList.append(w * 7 + 6)
-    model.addConstrs((x.sum(n, tmpSundayList, '*') >= min_we_shifts_per_nurse for n in nurseList_
-                      for d in tmpSundayList), name='MinTxWeekend')
-    model.addConstrs((x.sum(n, tmpSundayList, '*') <= max_we_shifts_per_nurse for n in nurseList
-                      for d in tmpSundayList), name='MaxTxWeekend')
+    sunday = np.flatnonzero(day % 7 == 6)
+    weekendShifts = incidence(nurse[sunday], num_nurses, sunday) @ x
+    model.addConstr(weekendShifts[1:] >= min_we_shifts_per_nurse, name='MinTxWeekend')
+    model.addConstr(weekendShifts <= max_we_shifts_per_nurse, name='MaxTxWeekend')
 
     ############################################################
     # Constraint: set minShift/maxShift variable to less/greater than the
@@ -138,10 +147,10 @@ try:
     numShiftPrima = model.addVar(name='maxShiftP')
     numShiftSeconda = model.addVar(name='maxShiftS')
     # Add constraint to the model solver
-    model.addGenConstrMin(minShift, totShifts, min_shifts_per_nurse, name='minShift')
-    model.addGenConstrMax(maxShift, totShifts, max_shifts_per_nurse, name='maxShift')
-    model.addGenConstrMax(numShiftPrima, turni_di_prima, num_turni_di_prima, name='maxShiftPr')
-    model.addGenConstrMax(numShiftSeconda, turni_di_seconda, num_turni_di_seconda, name='maxShiftSec')
+    model.addGenConstrMin(minShift, totShifts.tolist(), min_shifts_per_nurse, name='minShift')
+    model.addGenConstrMax(maxShift, totShifts.tolist(), max_shifts_per_nurse, name='maxShift')
+    model.addGenConstrMax(numShiftPrima, turni_di_prima.tolist(), num_turni_di_prima, name='maxShiftPr')
+    model.addGenConstrMax(numShiftSeconda, turni_di_seconda.tolist(), num_turni_di_seconda, name='maxShiftSec')
     # model.addGenConstrMin(minShiftWeekend, totShifts, name='minShiftSabDom')
     # model.addGenConstrMax(maxShiftWeekend, totShifts, name='maxShiftSabDom')
     ############################################################
@@ -185,17 +194,13 @@ try:
         print('Optimization was stopped with status ' + str(status))
         sys.exit(0)
 
-    sol = pd.DataFrame(data={'Solution': model.X}, index=model.VarName)
-    sol = sol.iloc[0:len(x)]
-    dashboard = pd.DataFrame(index=dayList, columns=shiftList)
-    for row in sol.iterrows():
-        index = row[0]
-        value = row[1].values[0]
-        if value:
-            index = index.replace('x[','')
-            index = index.replace(']','')
-            index = index.split(',')
-            dashboard.at[int(index[1]), int(index[2])] = index[0]
+    # the value vector scattered back to the (nurse, day, shift) array
+    assigned = np.zeros(avail.shape, dtype=np.int8)
+    assigned[avail] = np.rint(x.X)
+    board = np.full(shiftRequirements.shape, np.nan, dtype=object)
+    nurses, days, shifts = np.nonzero(assigned)
+    board[days, shifts] = nurses
+    dashboard = pd.DataFrame(board, index=dayList, columns=shiftList)
     solution_filename = 'Solution_workforce.csv'
     dashboard.to_csv(solution_filename)
     print('Done')
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""The multi-objective workforce model of workforce_gurobipy.py on the
+open-source solvers bundled with OR-Tools.
+
+The model is written once against pywraplp, which runs it on SCIP, CBC or
+CP-SAT, so the engines can be compared on the same instance without a
+Gurobi licence. The objectives are solved in sequence, each one allowed to
+degrade the ones before by up to the smaller of its absolute and relative
+tolerance, like setObjectiveN.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from ortools.linear_solver import pywraplp
+
+ENGINES = ['SCIP', 'CBC', 'CP-SAT']
+
+NUM_SHIFTS = 4
+SHIFTS_PER_WEEK = 16
+SUNDAY_SHIFTS = 4
+# shifts 0 and 1 are only worked on sundays
+SUNDAY_ONLY_SHIFTS = [0, 1]
+PRIMA_SHIFTS = [0, 2]
+SECONDA_SHIFTS = [1, 3]
+# MOLINARO does not work shifts 2 and 3
+RESTRICTED = {0: [2, 3]}
+
+
+class WorkforceModel(object):
+    """The workforce model of num_nurses operators over num_weeks weeks.
+
+    Every shift is covered, each operator works at most one shift a day and
+    one from monday to saturday of each week, and the sunday shifts are
+    bounded. The objectives, by priority, are the spread between the most
+    and the least shifts worked, bounded by the fair share like the
+    addGenConstrMax/Min of workforce_gurobipy.py, and the largest difference
+    between the prima and the seconda shifts of an operator.
+    """
+
+    def __init__(self, engine='SCIP', num_weeks=6, num_nurses=22):
+        self.solver = pywraplp.Solver.CreateSolver(engine)
+        if self.solver is None:
+            raise ValueError('The %s solver is not available' % engine)
+        self.engine = engine
+        self.num_weeks = num_weeks
+        self.num_nurses = num_nurses
+        self.num_days = num_weeks * 7
+        self.sundays = [w * 7 + 6 for w in range(num_weeks)]
+
+        tot_shifts_to_assign = SHIFTS_PER_WEEK * num_weeks
+        self.min_shifts_per_nurse = tot_shifts_to_assign // num_nurses
+        self.max_shifts_per_nurse = -(-tot_shifts_to_assign // num_nurses)
+        weekend_shifts_to_assign = SUNDAY_SHIFTS * num_weeks
+        self.min_we_shifts_per_nurse = weekend_shifts_to_assign // num_nurses
+        self.max_we_shifts_per_nurse = -(-weekend_shifts_to_assign // num_nurses)
+
+        self.requirements = np.ones((self.num_days, NUM_SHIFTS), dtype=np.int16)
+        weekdays = [d for d in range(self.num_days) if d % 7 != 6]
+        self.requirements[np.ix_(weekdays, SUNDAY_ONLY_SHIFTS)] = 0
+        self.available = np.repeat((self.requirements > 0)[np.newaxis], num_nurses, axis=0)
+        for n, shifts in RESTRICTED.items():
+            if n < num_nurses:
+                self.available[n][:, shifts] = False
+        self.x = {}
+        self.objectives = []
+        self.roster = None
+        self._build()
+
+    def _build(self):
+        solver = self.solver
+        x = self.x
+        for n, d, s in np.argwhere(self.available).tolist():
+            x[(n, d, s)] = solver.BoolVar('x[%i,%i,%i]' % (n, d, s))
+
+        def shifts_of(n, days, shift_list=range(NUM_SHIFTS)):
+            return [x[(n, d, s)] for d in days for s in shift_list if (n, d, s) in x]
+
+        for d, s in np.argwhere(self.requirements > 0).tolist():
+            solver.Add(solver.Sum([x[(n, d, s)] for n in range(self.num_nurses) if (n, d, s) in x])
+                       == int(self.requirements[d, s]))
+
+        max_shift = solver.IntVar(self.max_shifts_per_nurse, self.num_days, 'maxShift')
+        min_shift = solver.IntVar(0, self.min_shifts_per_nurse, 'minShift')
+        imbalance = solver.IntVar(0, self.num_days, 'imbalance')
+        for n in range(self.num_nurses):
+            for d in range(self.num_days):
+                solver.Add(solver.Sum(shifts_of(n, [d])) <= 1)
+            # balance weeks, at most one shift from monday to saturday
+            for w in range(self.num_weeks):
+                solver.Add(solver.Sum(shifts_of(n, range(w * 7, w * 7 + 6))) <= 1)
+            sundays = solver.Sum(shifts_of(n, self.sundays))
+            if n not in RESTRICTED:
+                solver.Add(sundays >= self.min_we_shifts_per_nurse)
+            solver.Add(sundays <= self.max_we_shifts_per_nurse)
+
+            total = solver.Sum(shifts_of(n, range(self.num_days)))
+            # the objective pushes max_shift down and min_shift up to the
+            # largest and the least total, capped by the fair share
+            solver.Add(max_shift >= total)
+            solver.Add(min_shift <= total)
+            difference = solver.Sum(shifts_of(n, range(self.num_days), PRIMA_SHIFTS)) - solver.Sum(
+                shifts_of(n, range(self.num_days), SECONDA_SHIFTS))
+            solver.Add(imbalance >= difference)
+            solver.Add(imbalance >= -difference)
+
+        # (name, expression, absolute tolerance, relative tolerance) by priority
+        self.objectives = [('Fairness', max_shift - min_shift, 2.0, 0.1),
+                           ('FairnessPrimaSeconda', imbalance, 0.0, 0.0)]
+
+    def solve(self, time_limit=None):
+        """Solves the objectives in sequence. Returns the pywraplp status of
+        the last solve and the value of each objective solved; self.roster is
+        the roster of the last solve that found one."""
+        solver = self.solver
+        values = []
+        status = pywraplp.Solver.NOT_SOLVED
+        for name, expression, abstol, reltol in self.objectives:
+            if time_limit:
+                solver.SetTimeLimit(int(time_limit * 1000))
+            solver.Minimize(expression)
+            status = solver.Solve()
+            if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+                break
+            value = solver.Objective().Value()
+            values.append((name, value))
+            self.roster = self._read_roster()
+            solver.Add(expression <= value + min(abstol, reltol * abs(value)))
+        return status, values
+
+    def _read_roster(self):
+        # (day, shift) array of the operator of each shift, -1 for the shifts
+        # nobody works
+        values = np.zeros(self.available.shape, dtype=np.int8)
+        for key, var in self.x.items():
+            values[key] = round(var.solution_value())
+        roster = np.full(values.shape[1:], -1, dtype=np.int16)
+        nurses, days, shifts = np.nonzero(values)
+        roster[days, shifts] = nurses
+        return roster
+
+
+def status_name(status):
+    return {pywraplp.Solver.OPTIMAL: 'OPTIMAL', pywraplp.Solver.FEASIBLE: 'FEASIBLE',
+            pywraplp.Solver.INFEASIBLE: 'INFEASIBLE', pywraplp.Solver.UNBOUNDED: 'UNBOUNDED',
+            pywraplp.Solver.ABNORMAL: 'ABNORMAL', pywraplp.Solver.NOT_SOLVED: 'NOT_SOLVED'}.get(status, str(status))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solves the workforce model of workforce_gurobipy.py with '
+                                                 'an open-source solver.')
+    parser.add_argument('--engine', choices=ENGINES, default='SCIP')
+    parser.add_argument('--weeks', type=int, default=6)
+    parser.add_argument('--nurses', type=int, default=22)
+    parser.add_argument('--time_limit', type=float, help='time budget in seconds of each objective')
+    parser.add_argument('--output', default='Solution_workforce.csv')
+    args = parser.parse_args(argv)
+
+    model = WorkforceModel(args.engine, args.weeks, args.nurses)
+    print("Min shifts per nurse {}".format(model.min_shifts_per_nurse))
+    print("Max shifts per nurse {}".format(model.max_shifts_per_nurse))
+    print("Min WE shifts per nurse {}".format(model.min_we_shifts_per_nurse))
+    print("Max WE shifts per nurse {}".format(model.max_we_shifts_per_nurse))
+    start = time.perf_counter()
+    status, values = model.solve(args.time_limit)
+    wall_time = time.perf_counter() - start
+    print()
+    print('Statistics')
+    print('  - engine          : %s' % args.engine)
+    print('  - status          : %s' % status_name(status))
+    for name, value in values:
+        print('  - %-16s: %g' % (name, value))
+    print('  - wall time       : %f s' % wall_time)
+    if len(values) < len(model.objectives):
+        print('The model cannot be solved')
+        return status
+    roster = model.roster
+    dashboard = pd.DataFrame(roster, columns=range(NUM_SHIFTS)).astype(object)
+    dashboard[roster < 0] = np.nan
+    dashboard.to_csv(args.output)
+    print('Done')
+    return status
+
+
+if __name__ == '__main__':
+    main()